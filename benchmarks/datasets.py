@@ -0,0 +1,104 @@
+# benchmarks/datasets.py
+"""
+Synthetic datasets with the same column layout as the real export
+(data/Viral_Social_Media_Trends_with_DateTime.csv), including its mix of
+'dd-mm-YYYY HH:MM' and unpadded 'm/d/YYYY H:MM' timestamps.
+
+    python -m benchmarks.datasets --rows 1m
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+PLATFORMS = ['TikTok', 'Instagram', 'Twitter', 'YouTube']
+HASHTAGS = ['#Challenge', '#Education', '#Dance', '#Comedy', '#Gaming', '#Music', '#Viral', '#Fitness', '#Tech', '#Fashion']
+CONTENT_TYPES = ['Video', 'Shorts', 'Post', 'Tweet', 'Live Stream', 'Reel']
+REGIONS = ['UK', 'India', 'Brazil', 'Australia', 'Japan', 'Germany', 'Canada', 'USA']
+ENGAGEMENT_LEVELS = ['High', 'Medium', 'Low']
+
+START, END = pd.Timestamp('2021-01-01'), pd.Timestamp('2025-01-01')
+# share of timestamps written day-first ('23-03-2021 06:19'), as in the real file
+DAY_FIRST_SHARE = 0.62
+CHUNK_ROWS = 1_000_000
+
+
+def parse_size(size) -> int:
+    return SIZES[size] if size in SIZES else int(size)
+
+
+def _keywords(n_keywords: int) -> np.ndarray:
+    extra = [f'#Topic{i}' for i in range(max(0, n_keywords - len(HASHTAGS)))]
+    return np.array((HASHTAGS + extra)[:n_keywords], dtype=object)
+
+
+def _minute_strings() -> tuple:
+    """Every minute between START and END rendered in both source formats (lookup tables)."""
+    minutes = pd.date_range(START, END, freq='min', inclusive='left')
+    pad = np.array([f'{i:02d}' for i in range(100)], dtype=object)
+    plain = np.array([str(i) for i in range(100)], dtype=object)
+    year = minutes.year.astype(str).to_numpy(dtype=object)
+    month, day, hour, minute = (minutes.month.to_numpy(), minutes.day.to_numpy(), minutes.hour.to_numpy(), minutes.minute.to_numpy())
+    day_first = pad[day] + '-' + pad[month] + '-' + year + ' ' + pad[hour] + ':' + pad[minute]
+    month_first = plain[month] + '/' + plain[day] + '/' + year + ' ' + plain[hour] + ':' + pad[minute]
+    return day_first, month_first
+
+
+def generate_frame(rng: np.random.Generator, start_id: int, rows: int, keywords: np.ndarray, formats: tuple) -> pd.DataFrame:
+    day_first, month_first = formats
+    slot = rng.integers(0, len(day_first), rows)
+    stamps = np.where(rng.random(rows) < DAY_FIRST_SHARE, day_first[slot], month_first[slot])
+    # a few unparseable/missing timestamps, which clean() drops
+    stamps[rng.random(rows) < 0.001] = ''
+    ids = np.arange(start_id + 1, start_id + rows + 1).astype(str).astype(object)
+    return pd.DataFrame({
+        'Post_ID': 'Post_' + ids,
+        'Platform': np.array(PLATFORMS, dtype=object)[rng.integers(0, len(PLATFORMS), rows)],
+        'Hashtag': keywords[(rng.zipf(1.3, rows) - 1) % len(keywords)],
+        'Content_Type': np.array(CONTENT_TYPES, dtype=object)[rng.integers(0, len(CONTENT_TYPES), rows)],
+        'Region': np.array(REGIONS, dtype=object)[rng.integers(0, len(REGIONS), rows)],
+        'Views': rng.integers(1_000, 5_000_000, rows),
+        'Likes': rng.integers(100, 500_000, rows),
+        'Shares': rng.integers(10, 100_000, rows),
+        'Comments': rng.integers(10, 50_000, rows),
+        'Engagement_Level': np.array(ENGAGEMENT_LEVELS, dtype=object)[rng.integers(0, len(ENGAGEMENT_LEVELS), rows)],
+        'DateTime': stamps,
+    })
+
+
+def dataset_path(rows: int, n_keywords: int = 100, seed: int = 0) -> Path:
+    return DATA_DIR / f'synthetic_{rows}_{n_keywords}kw_s{seed}.csv'
+
+
+def ensure_dataset(rows: int, n_keywords: int = 100, seed: int = 0) -> Path:
+    """Path of the synthetic CSV for these parameters, generating it (in 1M-row chunks) on first use."""
+    path = dataset_path(rows, n_keywords, seed)
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    keywords, formats = _keywords(n_keywords), _minute_strings()
+    tmp = path.with_suffix('.tmp')
+    for start in range(0, rows, CHUNK_ROWS):
+        frame = generate_frame(rng, start, min(CHUNK_ROWS, rows - start), keywords, formats)
+        frame.to_csv(tmp, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    tmp.replace(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic MediaPulse dataset")
+    parser.add_argument('--rows', default='10k', help="row count or one of 10k/1m/10m")
+    parser.add_argument('--keywords', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(ensure_dataset(parse_size(args.rows), args.keywords, args.seed))
+
+
+if __name__ == '__main__':
+    main()
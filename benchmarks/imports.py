@@ -0,0 +1,85 @@
+# benchmarks/imports.py
+"""
+Import-time budget: each module is imported in a fresh interpreter (best of --repeat)
+and must stay under its time budget without pulling in the heavy libraries it is
+meant to load lazily. Guards the cold start of API workers and short batch jobs.
+
+    python -m benchmarks.imports                 # exit 1 if a budget is exceeded
+    python -m benchmarks.imports --scale 2       # slower machine: double the time budgets
+
+On failure the slowest imports (python -X importtime) are listed.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DATA_STACK = ('pandas', 'numpy', 'dateutil', 'pyarrow')
+PLOTTING = ('plotly', 'matplotlib')
+
+# module -> (seconds, top-level packages it must not import)
+BUDGETS: Dict[str, Tuple[float, Tuple[str, ...]]] = {
+    'mediapulse.api': (1.0, DATA_STACK + PLOTTING),
+    'mediapulse.charts': (1.0, PLOTTING),
+}
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': sorted({{m.split('.')[0] for m in sys.modules}})}}))
+"""
+
+
+def probe(module: str) -> dict:
+    out = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def slowest_imports(module: str, n: int = 10) -> List[str]:
+    """The n imports with the largest cumulative time, from python -X importtime."""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT, capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return [f"{us / 1e6:8.3f} s {name}" for us, name in sorted(rows, reverse=True)[:n]]
+
+
+def check(repeat: int, scale: float) -> List[str]:
+    problems = []
+    for module, (budget, forbidden) in BUDGETS.items():
+        runs = [probe(module) for _ in range(repeat)]
+        seconds = min(r['seconds'] for r in runs)
+        loaded = sorted(set(forbidden) & set(runs[0]['modules']))
+        print(f"{module:<24} {seconds * 1000:>8.1f} ms (budget {budget * scale * 1000:.0f} ms)"
+              + (f"  imports {', '.join(loaded)}" if loaded else ''), flush=True)
+        if loaded:
+            problems.append(f"{module} imports {', '.join(loaded)}")
+        if seconds > budget * scale:
+            problems.append(f"{module} takes {seconds * 1000:.1f} ms (budget {budget * scale * 1000:.0f} ms)")
+        if loaded or seconds > budget * scale:
+            for line in slowest_imports(module):
+                print(f"    {line}")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="MediaPulse import-time budget")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplier for the time budgets")
+    args = parser.parse_args(argv)
+    problems = check(args.repeat, args.scale)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
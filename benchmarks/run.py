@@ -0,0 +1,292 @@
+# benchmarks/run.py
+"""
+Benchmarks for the ingest -> clean -> aggregate -> analytics pipeline and the API.
+
+Every case is timed (best of --repeat runs; a case that looks slower than the baseline is
+timed once more) and run once more under tracemalloc for its peak Python/NumPy allocation.
+Each case also records a digest of its output, so a change that alters results is caught
+as well as one that makes them slower.
+
+    python -m benchmarks.run --sizes 10k,1m                       # print results
+    python -m benchmarks.run --sizes 10k,1m --save-baseline       # record benchmarks/baseline.json
+    python -m benchmarks.run --sizes 10k,1m --baseline benchmarks/baseline.json   # compare; exit 1 on regression
+
+Digests don't depend on the machine, but seconds and peak_bytes do (CPU, core count,
+Python/pandas/NumPy versions): record the baseline with `make benchmark-baseline` on the
+machine that runs the comparison. The committed benchmarks/baseline.json was recorded
+on the machine named in it (see ENVIRONMENT_KEYS); run.py prints a note when comparing
+against a baseline from a different environment.
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.datasets import HASHTAGS, PLATFORMS, ensure_dataset, parse_size  # noqa: E402
+from mediapulse.analytics import AnalyticsSummary  # noqa: E402
+from mediapulse.fetcher import DataFetcher  # noqa: E402
+from mediapulse.index import DatasetIndex  # noqa: E402
+from mediapulse.processor import DataProcessor  # noqa: E402
+from mediapulse.sketch import EngagementSketches  # noqa: E402
+from mediapulse.store import DatasetStore  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+# recorded with every report; timings are only comparable between reports that agree on these
+ENVIRONMENT_KEYS = ('python', 'pandas', 'numpy', 'machine', 'cpus')
+BY_COLS = ['platform', 'content_type', 'region']
+FILTERS = dict(keywords=['#Challenge', '#dance', '#Topic3'], platforms=['tiktok', 'YouTube'], regions=['uk', 'India', 'USA'])
+# a reporting job's worth of queries: one per keyword x platform, same period and regions
+BATCH = [dict(keywords=[k], platforms=[pl], regions=FILTERS['regions'], freq='D', start='2023-01-01', end='2023-06-30 12:00')
+         for k in HASHTAGS for pl in PLATFORMS]
+
+
+def digest(value) -> str:
+    """Stable fingerprint of a result; floats are rounded so last-ulp noise doesn't count as a change."""
+    h = hashlib.sha1()
+    if isinstance(value, pd.Series):
+        value = value.to_frame()
+    if isinstance(value, pd.DataFrame):
+        frame = value.reset_index(drop=True)
+        for col in frame.columns:
+            if frame[col].dtype.kind == 'f':
+                frame[col] = frame[col].round(6)
+            elif isinstance(frame[col].dtype, pd.CategoricalDtype):
+                frame[col] = frame[col].astype(str)
+        h.update(','.join(map(str, frame.columns)).encode('utf-8'))
+        h.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    else:
+        h.update(json.dumps(value, sort_keys=True, default=_round_default).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def _round_default(obj):
+    if isinstance(obj, (float, np.floating)):
+        return round(float(obj), 6)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+def _round_floats(value):
+    if isinstance(value, dict):
+        return {k: _round_floats(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_round_floats(v) for v in value]
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+class Pipeline:
+    """Intermediate results shared by the cases of one dataset size (built once, untimed)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.fetcher = DataFetcher(str(path))
+        self.processor = DataProcessor()
+        self.analytics = AnalyticsSummary()
+        self.raw = self.fetcher.fetch()
+        self.cleaned = self.processor.clean(self.raw)
+        self.index = DatasetIndex(self.cleaned)
+        self.sketches = EngagementSketches.from_frame(self.cleaned)
+        self.agg = self.processor.aggregate(self.cleaned, freq='W', by_cols=BY_COLS)
+        self.totals = self.processor.aggregate(self.cleaned, freq='D')
+        top = self.totals.groupby('keyword', observed=True)['count'].sum().idxmax()
+        # single-keyword series, as the per-keyword analytics methods expect
+        self.series = self.totals[self.totals['keyword'] == top].sort_values('datetime')
+
+
+def cases(p: Pipeline) -> List[Tuple[str, Callable[[], object]]]:
+    a = p.analytics
+    return [
+        ('fetcher.fetch', p.fetcher.fetch),
+        ('processor.clean', lambda: p.processor.clean(p.raw)),
+        ('processor.aggregate[W,by_cols]', lambda: p.processor.aggregate(p.cleaned, freq='W', by_cols=BY_COLS)),
+        ('processor.aggregate[D]', lambda: p.processor.aggregate(p.cleaned, freq='D')),
+        ('processor.filter_multi[scan]', lambda: p.processor.filter_multi(p.cleaned, **FILTERS)),
+        ('processor.filter_multi[index]', lambda: p.processor.filter_multi(p.cleaned, index=p.index, **FILTERS)),
+        ('analytics.compute_peak', lambda: a.compute_peak(p.series)),
+        ('analytics.compute_avg', lambda: a.compute_avg(p.series)),
+        ('analytics.compute_trend', lambda: a.compute_trend(p.series)),
+        ('analytics.moving_average', lambda: a.moving_average(p.series, 7)),
+        ('analytics.percent_change', lambda: a.percent_change(p.series)),
+        ('analytics.top_trending_keywords', lambda: a.top_trending_keywords(p.totals, 7, 10)),
+        ('analytics.spike_detection[zscore]', lambda: a.spike_detection(p.agg)),
+        ('analytics.spike_detection[robust]', lambda: a.spike_detection(p.agg, method='robust')),
+        ('analytics.spike_detection[rolling]', lambda: a.spike_detection(p.agg, window=8)),
+        ('analytics.engagement_distribution', lambda: a.engagement_distribution(p.cleaned)),
+        ('sketches.from_frame', lambda: EngagementSketches.from_frame(p.cleaned).moments),
+        ('sketches.distribution', lambda: p.sketches.distribution('platform')),
+        ('sketches.box_stats[filtered]', lambda: p.sketches.box_stats('platform', platforms=FILTERS['platforms'],
+                                                                     regions=FILTERS['regions']).drop(columns='outliers')),
+        ('analytics.region_top_content', lambda: a.region_top_content(p.cleaned, 'india')),
+        ('analytics.compute_all', lambda: a.compute_all(p.series)),
+        ('analytics.compute_all_batch', lambda: a.compute_all_batch(p.agg)),
+    ]
+
+
+def api_cases(p: Pipeline) -> List[Tuple[str, Callable[[], object]]]:
+    from fastapi.testclient import TestClient
+    import mediapulse.api as api
+    api.init_services()
+    api.store = DatasetStore(p.fetcher, api.processor)
+    client = TestClient(api.app)
+    requests = {
+        'api./analyze_multi[W]': dict(FILTERS, freq='W'),
+        'api./analyze_multi[D,start,end]': dict(FILTERS, freq='D', start='2023-01-01', end='2023-06-30 12:00'),
+    }
+    client.post('/analyze_multi', json={})  # loads the dataset into the store
+
+    def call(body):
+        def run():
+            # measure the computation, not the response cache
+            api.results.clear()
+            r = client.post('/analyze_multi', json=body)
+            out = r.json()
+            if isinstance(out, dict):
+                out.pop('dataset_version', None)
+            return [r.status_code, _round_floats(out)]
+        return run
+
+    def batch():
+        api.results.clear()
+        r = client.post('/analyze_batch', json={'queries': BATCH})
+        return [r.status_code, _round_floats([dict(a, dataset_version=None) for a in r.json()['results']])]
+
+    def one_by_one():
+        return [call(body)() for body in BATCH]
+    return [(name, call(body)) for name, body in requests.items()] + [
+        (f'api./analyze_batch[{len(BATCH)} queries]', batch),
+        (f'api./analyze_multi[{len(BATCH)} queries, one by one]', one_by_one),
+    ]
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, object]:
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+        del result
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'peak_bytes': peak, 'digest': digest(result)}
+
+
+def too_slow(seconds: float, base: float, time_tolerance: float, min_seconds: float) -> bool:
+    # very short cases are dominated by noise; judge them against an absolute floor
+    return seconds > max(base * (1 + time_tolerance), base + min_seconds)
+
+
+def run(sizes: List[str], repeat: int, n_keywords: int, seed: int, include_api: bool, only: str = None,
+        baseline: Dict[str, Dict] = None, time_tolerance: float = 1.0, min_seconds: float = 0.01) -> Dict[str, Dict]:
+    results = {}
+    for size in sizes:
+        rows = parse_size(size)
+        path = ensure_dataset(rows, n_keywords, seed)
+        pipeline = Pipeline(path)
+        selected = cases(pipeline) + (api_cases(pipeline) if include_api else [])
+        for name, fn in selected:
+            if only and only not in name:
+                continue
+            key = f'{size}/{name}'
+            # large inputs: a single timed run is enough and keeps the suite bounded
+            results[key] = measure(fn, repeat if rows < 10_000_000 else 1)
+            r = results[key]
+            base = (baseline or {}).get(key)
+            if base is not None and too_slow(r['seconds'], base['seconds'], time_tolerance, min_seconds):
+                # a scheduling spike rarely repeats: time it once more before it counts as a regression
+                r['seconds'] = min(r['seconds'], measure(fn, repeat if rows < 10_000_000 else 1)['seconds'])
+            print(f"{key:<52} {r['seconds'] * 1000:>10.2f} ms {r['peak_bytes'] / 2 ** 20:>9.1f} MiB  {r['digest']}", flush=True)
+        del pipeline
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], time_tolerance: float, memory_tolerance: float,
+            min_seconds: float) -> List[str]:
+    """Regressions of results against baseline: changed outputs, slower or bigger runs."""
+    problems = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if r['digest'] != base['digest']:
+            problems.append(f"{key}: output changed ({base['digest']} -> {r['digest']})")
+        if too_slow(r['seconds'], base['seconds'], time_tolerance, min_seconds):
+            problems.append(f"{key}: {base['seconds'] * 1000:.2f} ms -> {r['seconds'] * 1000:.2f} ms")
+        if r['peak_bytes'] > base['peak_bytes'] * (1 + memory_tolerance) + 2 ** 20:
+            problems.append(f"{key}: peak {base['peak_bytes'] / 2 ** 20:.1f} MiB -> {r['peak_bytes'] / 2 ** 20:.1f} MiB")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="MediaPulse pipeline benchmarks")
+    parser.add_argument('--sizes', default='10k', help="comma-separated: 10k, 1m, 10m or row counts")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--keywords', type=int, default=100, help="distinct hashtags in the synthetic data")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-api', action='store_true', help="skip the /analyze_multi cases")
+    parser.add_argument('--only', help="run only cases whose name contains this")
+    parser.add_argument('--baseline', help="baseline JSON to compare against")
+    parser.add_argument('--save-baseline', nargs='?', const=str(DEFAULT_BASELINE), help="write results as the new baseline")
+    parser.add_argument('--output', help="also write results to this JSON file")
+    # back-to-back runs of the same code drift by up to ~75% on a busy or throttled machine;
+    # the gate is for algorithmic regressions (2x and up), digests catch changed output
+    parser.add_argument('--time-tolerance', type=float, default=1.0, help="allowed slowdown (1.0 = 100%%)")
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    parser.add_argument('--min-seconds', type=float, default=0.01, help="slowdowns below this are ignored")
+    args = parser.parse_args(argv)
+
+    # read the baseline before spending minutes on the cases
+    baseline = None
+    if args.baseline:
+        path = Path(args.baseline)
+        if not path.is_file():
+            parser.error(f"baseline {path} not found; record one with `make benchmark-baseline` (--save-baseline)")
+        recorded = json.loads(path.read_text(encoding='utf-8'))
+        baseline = recorded['results']
+
+    results = run(args.sizes.split(','), args.repeat, args.keywords, args.seed, not args.no_api, args.only,
+                  baseline, args.time_tolerance, args.min_seconds)
+    report = {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+              'machine': platform.machine(), 'cpus': os.cpu_count(), 'results': results}
+    for target in (args.output, args.save_baseline):
+        if target:
+            Path(target).write_text(json.dumps(report, indent=2, sort_keys=True), encoding='utf-8')
+            print(f"wrote {target}")
+    if baseline is not None:
+        differs = [f"{k} {recorded.get(k)} -> {report[k]}" for k in ENVIRONMENT_KEYS if recorded.get(k) != report[k]]
+        if differs:
+            print(f"note: {args.baseline} was recorded in another environment ({', '.join(differs)}); "
+                  "timings may not be comparable, re-record it with `make benchmark-baseline`")
+        problems = compare(results, baseline, args.time_tolerance, args.memory_tolerance, args.min_seconds)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            return 1
+        print(f"no regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
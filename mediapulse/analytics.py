@@ -2,6 +2,7 @@
 import pandas as pd
 import numpy as np
 from typing import Dict
+from mediapulse.processor import isin_ci
 
 class AnalyticsSummary:
     def compute_peak(self, df: pd.DataFrame) -> int:
@@ -35,44 +36,81 @@ class AnalyticsSummary:
         return float(((df['count'].iloc[-1] - df['count'].iloc[0]) / start) * 100)
 
     def top_trending_keywords(self, df: pd.DataFrame, last_n_periods: int = 7, top_k: int = 5) -> pd.DataFrame:
-        recent_periods = sorted(df['datetime'].unique())[-last_n_periods:]
-        recent = df[df['datetime'].isin(recent_periods)]
-        summary = recent.groupby('keyword')['count'].sum().reset_index().sort_values('count', ascending=False).head(top_k)
-        return summary
+        times = df['datetime'].to_numpy()
+        recent_periods = np.unique(times)[-last_n_periods:]
+        if len(recent_periods) == 0 or top_k <= 0:
+            return pd.DataFrame(columns=['keyword', 'count'])
+        # the last N distinct periods are exactly those at or after the N-th newest
+        recent = df[times >= recent_periods[0]]
+        summary = recent.groupby('keyword', observed=True)['count'].sum().reset_index()
+        # one row per keyword, so sorting it all is cheap; a partial selection would pick
+        # different keywords among those tied at the cutoff than this (unstable) sort does
+        return summary.sort_values('count', ascending=False).head(top_k)
 
-    def spike_detection(self, df: pd.DataFrame, z_thresh: float = 2.5) -> pd.DataFrame:
+    def spike_detection(self, df: pd.DataFrame, z_thresh: float = 2.5, method: str = 'zscore', window: int = None) -> pd.DataFrame:
         """
         Returns rows flagged as spikes based on z-score on counts grouped by keyword.
+
+        method='zscore' scores against each keyword's mean/std; method='robust' uses the
+        median and MAD (scaled by 1.4826) so a few huge spikes don't mask the rest.
+        With window=N each row is scored only against the N rows before it for the same
+        keyword (in datetime order); the robust rolling scale is IQR/1.349 since a rolling
+        MAD can't be computed without a per-window Python call.
         """
-        out = []
-        for kw, g in df.groupby('keyword'):
-            counts = g['count']
-            mean = counts.mean()
-            std = counts.std(ddof=0) or 1.0
-            z = (counts - mean) / std
-            spikes = g.loc[z.abs() > z_thresh].copy()
-            spikes['z_score'] = z[z.abs() > z_thresh]
-            if not spikes.empty:
-                out.append(spikes)
-        if out:
-            return pd.concat(out).sort_values(['keyword','datetime'])
+        if method not in ('zscore', 'robust'):
+            raise ValueError(f"Unknown spike detection method: {method}")
+        if df.empty:
+            return pd.DataFrame(columns=list(df.columns)+['z_score'])
+        if window:
+            d = df.sort_values(['keyword', 'datetime'], kind='mergesort')
+        else:
+            d = df
+        counts = d['count'].to_numpy(dtype=float)
+        groups = d.groupby('keyword', observed=True, sort=False, dropna=False)['count']
+        if window:
+            # history = previous `window` counts of the same keyword; d is sorted by keyword,
+            # so the grouped rolling output lines up with d row for row
+            prev = groups.shift(1)
+            rolling = prev.groupby(d['keyword'], observed=True, sort=False, dropna=False).rolling(window, min_periods=2)
+            if method == 'zscore':
+                center = rolling.mean()
+                scale = rolling.std(ddof=0)
+            else:
+                center = rolling.median()
+                scale = (rolling.quantile(0.75) - rolling.quantile(0.25)) / 1.349
+        elif method == 'zscore':
+            center = groups.transform('mean')
+            scale = groups.transform('std', ddof=0)
         else:
+            center = groups.transform('median')
+            scale = (d['count'] - center).abs().groupby(d['keyword'], observed=True, sort=False).transform('median') * 1.4826
+        center = center.to_numpy(dtype=float)
+        scale = scale.to_numpy(dtype=float)
+        # a flat series has no spread; score it against 1 like the per-keyword version did
+        scale = np.where(scale == 0, 1.0, scale)
+        z = (counts - center) / scale
+        hit = np.abs(z) > z_thresh
+        spikes = d[hit].copy()
+        spikes['z_score'] = z[hit]
+        if spikes.empty:
             return pd.DataFrame(columns=list(df.columns)+['z_score'])
+        return spikes.sort_values(['keyword', 'datetime'], kind='mergesort')
 
     def engagement_distribution(self, df: pd.DataFrame, by: str = 'platform') -> pd.DataFrame:
         """
         Return summary statistics of engagement grouped by 'by' (platform/content_type/region)
+        (snapshot.sketches.distribution answers the same without a row scan, median within 1%)
         """
         if by not in df.columns:
             raise ValueError(f"{by} not a column")
-        summary = df.groupby(by)['engagement'].agg(['count','mean','median','std','max']).reset_index()
+        summary = df.groupby(by, observed=True)['engagement'].agg(['count','mean','median','std','max']).reset_index()
         return summary
 
     def region_top_content(self, df: pd.DataFrame, region: str, top_k: int = 5) -> pd.DataFrame:
-        region_df = df[df['region'].str.lower() == region.lower()]
+        region_df = df[isin_ci(df['region'], [region])]
         if region_df.empty:
             return pd.DataFrame()
-        return region_df.groupby('content_type')['engagement'].sum().reset_index().sort_values('engagement', ascending=False).head(top_k)
+        return region_df.groupby('content_type', observed=True)['engagement'].sum().reset_index().sort_values('engagement', ascending=False).head(top_k)
 
     def compute_all(self, df: pd.DataFrame, ma_window: int = 3) -> Dict:
         return {
@@ -82,3 +120,52 @@ class AnalyticsSummary:
             'percent_change': round(self.percent_change(df), 2),
             'moving_average': self.moving_average(df, window=ma_window).tolist()
         }
+
+    def compute_all_batch(self, df: pd.DataFrame, ma_window: int = 3) -> Dict[str, Dict]:
+        """
+        compute_all for every keyword of an aggregated frame in one pass. Keywords are
+        matched case-insensitively and each keyword's rows are taken in datetime order;
+        rows with the same datetime (e.g. one per platform/region) keep their order in
+        df. That is compute_all on
+        df[df['keyword'].str.lower() == kw.lower()].sort_values('datetime', kind='stable')
+        per keyword: moving_average and the first/last counts depend on that tie order.
+        """
+        if df.empty:
+            return {}
+        kw = df['keyword']
+        if isinstance(kw.dtype, pd.CategoricalDtype):
+            # lowercase/factorize only the dictionary, then map row codes through it
+            cat_key, lowered = pd.factorize(kw.cat.categories.astype(str).str.lower())
+            key = cat_key[kw.cat.codes.to_numpy()]
+        else:
+            key, lowered = pd.factorize(kw.astype(str).str.lower())
+        # lexsort is stable: equal (keyword, datetime) rows keep their frame order
+        order = np.lexsort((df['datetime'].to_numpy(), key))
+        key = key[order]
+        counts = df['count'].to_numpy()[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(key)) + 1]
+        ends = np.r_[starts[1:], len(key)]
+        sizes = ends - starts
+
+        peak = np.maximum.reduceat(counts, starts)
+        avg = np.add.reduceat(counts.astype(float), starts) / sizes
+        first = counts[starts]
+        last = counts[ends - 1]
+        multi = sizes >= 2
+        pct = np.where(multi, ((last - first) / np.where(first == 0, 1, first)) * 100, 0.0)
+        trend = np.where(multi & (last > first), '↑', np.where(multi & (last < first), '↓', '→'))
+        # key is sorted, so grouped rolling output comes back in the same row order
+        ma = pd.Series(counts).groupby(key, sort=False).rolling(window=ma_window, min_periods=1).mean().to_numpy()
+        ma_parts = np.split(ma, starts[1:])
+
+        by_lower = {}
+        for i, k in enumerate(key[starts]):
+            by_lower[lowered[k]] = {
+                'peak': int(peak[i]),
+                'avg': round(float(avg[i]), 2),
+                'trend': str(trend[i]),
+                'percent_change': round(float(pct[i]), 2),
+                'moving_average': ma_parts[i].tolist()
+            }
+        names = sorted(kw.unique().tolist())
+        return {name: by_lower[str(name).lower()] for name in names}
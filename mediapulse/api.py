@@ -1,17 +1,110 @@
 # mediapulse/api.py (updated)
-from fastapi import FastAPI, HTTPException
+import asyncio
+import base64
+import binascii
+import contextlib
+import contextvars
+import functools
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import json
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from mediapulse.fetcher import DataFetcher
-from mediapulse.processor import DataProcessor
-from mediapulse.analytics import AnalyticsSummary
-import pandas as pd
-from typing import List, Optional
+from mediapulse.result_cache import ResultCache
+from mediapulse import metrics
+from typing import TYPE_CHECKING, List, Literal, Optional, Tuple
 
-app = FastAPI(title="MediaPulse API - Enhanced")
+# pandas, NumPy and the modules built on them are imported on first use (see init_services),
+# so importing this module - and starting a worker - stays cheap
+if TYPE_CHECKING:
+    import pandas as pd
+    from mediapulse.trending import TrendingWindow
+else:
+    # pandas, bound by init_services(); handlers get a snapshot first, so it is set when they run
+    pd = None
 
-fetcher = DataFetcher()
-processor = DataProcessor()
-analytics = AnalyticsSummary()
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load the dataset before the first request instead of during it
+    await run_in_pool(warm_up)
+    yield
+
+app = FastAPI(title="MediaPulse API - Enhanced", lifespan=lifespan)
+
+# created by init_services() - at startup, or on first use when the app runs without its lifespan
+fetcher = None
+processor = None
+analytics = None
+store = None
+_services_lock = threading.Lock()
+
+def init_services():
+    """Create the fetcher/processor/analytics/store that are not set yet (imports the data stack)."""
+    global fetcher, processor, analytics, store, pd
+    if store is not None and processor is not None and analytics is not None and pd is not None:
+        return
+    with _services_lock:
+        import pandas as pd
+        from mediapulse.analytics import AnalyticsSummary
+        from mediapulse.fetcher import DataFetcher
+        from mediapulse.processor import DataProcessor
+        from mediapulse.store import DatasetStore
+        if fetcher is None:
+            fetcher = DataFetcher()
+        if processor is None:
+            processor = DataProcessor()
+        if analytics is None:
+            analytics = AnalyticsSummary()
+        if store is None:
+            # cleaned dataset is loaded once and shared by all requests; reloads on source change.
+            # With MEDIAPULSE_SHARED_DIR set, workers attach to the dataset a loader process publishes
+            # there (python -m mediapulse.shared) instead of each loading a private copy.
+            if os.environ.get('MEDIAPULSE_SHARED_DIR'):
+                from mediapulse.shared import SharedDataset
+                store = DatasetStore(fetcher, processor, shared=SharedDataset(os.environ['MEDIAPULSE_SHARED_DIR']))
+            else:
+                from mediapulse.frame_cache import FrameCache
+                store = DatasetStore(fetcher, processor, cache=FrameCache())
+
+def current_snapshot():
+    init_services()
+    return store.get()
+
+def warm_up():
+    """Startup hook: create the services and load the dataset (a missing dataset is left to the requests to report)."""
+    try:
+        current_snapshot()
+    except FileNotFoundError:
+        pass
+
+# pandas work runs on a bounded pool so the event loop stays free to accept requests
+compute_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('MEDIAPULSE_COMPUTE_WORKERS', 4)), thread_name_prefix='mediapulse')
+# responses keyed by normalized request + dataset version; identical concurrent requests share one computation
+results = ResultCache(maxsize=int(os.environ.get('MEDIAPULSE_CACHE_SIZE', 256)), ttl=float(os.environ.get('MEDIAPULSE_CACHE_TTL', 30)))
+
+async def run_in_pool(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # run_in_executor doesn't carry context variables over; the metrics request scope lives in one
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(compute_pool, functools.partial(ctx.run, fn, *args, **kwargs))
+
+if metrics.enabled:
+    @app.middleware("http")
+    async def record_metrics(request: Request, call_next):
+        scope = metrics.request_scope()
+        start = time.perf_counter()
+        response = await call_next(request)
+        # only endpoints that label themselves are recorded (keeps path parameters out of the labels)
+        if scope.endpoint:
+            metrics.request_seconds.observe(time.perf_counter() - start, (scope.endpoint, scope.freq))
+        header = metrics.server_timing_header(scope)
+        if header:
+            response.headers['Server-Timing'] = header
+        return response
 
 class AnalyzeRequest(BaseModel):
     keywords: Optional[List[str]] = None
@@ -23,39 +116,397 @@ class AnalyzeRequest(BaseModel):
     end: str = None
     engagement_weighted: bool = False
     ma_window: int = 3
+    # 'records' (default): row objects; 'columnar': {column: [values]} per table, encoded
+    # directly from NumPy; 'arrow': one table as an Arrow IPC stream (pick it with `table`)
+    format: Literal['records', 'columnar', 'arrow'] = 'records'
+    table: Literal['agg_preview', 'stats', 'spikes'] = 'spikes'
 
-@app.post("/analyze_multi")
-def analyze_multi(req: AnalyzeRequest):
-    df = fetcher.fetch()
-    df = processor.clean(df)
-    filtered = processor.filter_multi(df, keywords=req.keywords, platforms=req.platforms, content_types=req.content_types, regions=req.regions, start=req.start, end=req.end)
-    if filtered.empty:
+def _normalized(values):
+    return tuple(sorted({v.lower() for v in values})) if values else None
+
+def _filter_key(req: AnalyzeRequest) -> tuple:
+    return (_normalized(req.keywords), _normalized(req.platforms), _normalized(req.content_types), _normalized(req.regions),
+            req.freq, req.start or None, req.end or None, req.engagement_weighted)
+
+def request_key(req: AnalyzeRequest) -> tuple:
+    """Cache key for a request: filter lists are case/order/duplicate-insensitive, like the filters themselves."""
+    return _filter_key(req) + (req.ma_window, req.format, req.table if req.format == 'arrow' else None)
+
+BY_COLS = ['platform', 'content_type', 'region']
+
+def _filters(req: AnalyzeRequest) -> dict:
+    return dict(keywords=req.keywords, platforms=req.platforms, content_types=req.content_types, regions=req.regions, start=req.start, end=req.end)
+
+def _check_bounds(req: AnalyzeRequest):
+    """422 unless start/end (when given) parse as timestamps."""
+    for name in ('start', 'end'):
+        value = getattr(req, name)
+        if not value:
+            continue
+        try:
+            valid = pd.Timestamp(value) is not pd.NaT
+        except (ValueError, TypeError, OverflowError):
+            valid = False
+        if not valid:
+            raise HTTPException(status_code=422, detail=f"Invalid {name}: {value!r}")
+
+def _aggregate(snap, req: AnalyzeRequest) -> 'pd.DataFrame':
+    _check_bounds(req)
+    filters = _filters(req)
+    if snap.rollup.can_answer(req.freq, req.start, req.end):
+        with metrics.stage('rollup_aggregate', rows_in=len(snap.rollup.daily)) as s:
+            agg = snap.rollup.aggregate(freq=req.freq, by_cols=BY_COLS, engagement_weighted=req.engagement_weighted, **filters)
+            s.rows_out = len(agg)
+        return agg
+    with metrics.stage('filter_multi', rows_in=len(snap.df)) as s:
+        filtered = processor.filter_multi(snap.df, index=snap.index, **filters)
+        s.rows_out = len(filtered)
+    with metrics.stage('aggregate', rows_in=len(filtered)) as s:
+        agg = processor.aggregate(filtered, freq=req.freq, by_cols=BY_COLS, engagement_weighted=req.engagement_weighted)
+        s.rows_out = len(agg)
+    return agg
+
+def _analyze(snap, req: AnalyzeRequest) -> dict:
+    return _summarize(snap, req, _aggregate(snap, req))
+
+def _summarize(snap, req: AnalyzeRequest, agg: 'pd.DataFrame') -> dict:
+    from mediapulse.serialization import arrow_table, frame_columns, stats_frame
+    if agg.empty:
         raise HTTPException(status_code=404, detail="No data for filters")
-    agg = processor.aggregate(filtered, freq=req.freq, by_cols=['platform','content_type','region'], engagement_weighted=req.engagement_weighted)
     # return top keywords & stats
-    keywords = sorted(filtered['keyword'].unique().tolist())
-    stats = {}
-    for kw in keywords:
-        kw_df = agg[agg['keyword'].str.lower() == kw.lower()].sort_values('datetime')
-        stats[kw] = analytics.compute_all(kw_df, ma_window=req.ma_window)
+    with metrics.stage('compute_all', rows_in=len(agg)) as s:
+        stats = analytics.compute_all_batch(agg, ma_window=req.ma_window)
+        s.rows_out = len(stats)
     # spikes
-    spikes = analytics.spike_detection(agg)
-    spikes_json = spikes.to_dict(orient='records') if not spikes.empty else []
-    return {
-        "filters": {
-            "keywords": req.keywords, "platforms": req.platforms, "content_types": req.content_types, "regions": req.regions
-        },
-        "agg_preview": agg.head(50).to_dict(orient='records'),
-        "stats": stats,
-        "spikes": spikes_json
+    with metrics.stage('spike_detection', rows_in=len(agg)) as s:
+        spikes = analytics.spike_detection(agg)
+        s.rows_out = len(spikes)
+    with metrics.stage('serialize'):
+        if req.format == 'columnar':
+            return {
+                "dataset_version": snap.version,
+                "agg_preview": frame_columns(agg.head(50)),
+                "stats": frame_columns(stats_frame(stats)),
+                "spikes": frame_columns(spikes)
+            }
+        if req.format == 'arrow':
+            tables = {'agg_preview': lambda: agg.head(50), 'stats': lambda: stats_frame(stats), 'spikes': lambda: spikes}
+            return {"dataset_version": snap.version, "table": arrow_table(tables[req.table]())}
+        spikes_json = spikes.to_dict(orient='records') if not spikes.empty else []
+        return {
+            "dataset_version": snap.version,
+            "agg_preview": agg.head(50).to_dict(orient='records'),
+            "stats": stats,
+            "spikes": spikes_json
+        }
+
+def _encode(fn, *args):
+    with metrics.stage('encode'):
+        return fn(*args)
+
+@app.post("/analyze_multi")
+async def analyze_multi(req: AnalyzeRequest):
+    metrics.label(endpoint='/analyze_multi', freq=req.freq)
+    snap = await run_in_pool(current_snapshot)
+    key = ('analyze_multi', snap.version) + request_key(req)
+    body = await results.get_or_compute(key, lambda: run_in_pool(_analyze, snap, req))
+    # cached bodies are shared between equivalent requests; echo this caller's own filters
+    filters = {"keywords": req.keywords, "platforms": req.platforms, "content_types": req.content_types, "regions": req.regions}
+    from mediapulse.serialization import ARROW_STREAM_MEDIA_TYPE, arrow_ipc_stream, dumps
+    if req.format == 'arrow':
+        metadata = {"dataset_version": body["dataset_version"], "filters": json.dumps(filters), "table": req.table}
+        return Response(content=await run_in_pool(_encode, arrow_ipc_stream, body["table"], metadata), media_type=ARROW_STREAM_MEDIA_TYPE)
+    payload = {
+        "dataset_version": body["dataset_version"],
+        "filters": filters,
+        **{k: v for k, v in body.items() if k != "dataset_version"}
     }
+    if req.format == 'columnar':
+        return Response(content=await run_in_pool(_encode, dumps, payload), media_type='application/json')
+    return payload
 
-@app.get("/region_summary/{region}")
-def region_summary(region: str):
-    df = fetcher.fetch()
-    df = processor.clean(df)
-    summary = analytics.region_top_content(df, region)
+class BatchRequest(BaseModel):
+    # each query takes the same fields as /analyze_multi ('arrow' is not available in a batch)
+    queries: List[AnalyzeRequest]
+
+def _aggregate_batch(snap, reqs: List[AnalyzeRequest]) -> list:
+    """_aggregate() for every request, sharing one aggregation per (freq, metric, time range)."""
+    groups = {}
+    for i, req in enumerate(reqs):
+        from_rollup = snap.rollup.can_answer(req.freq, req.start, req.end)
+        groups.setdefault((req.freq, req.engagement_weighted, from_rollup), []).append(i)
+    aggs = [None] * len(reqs)
+    for (freq, engagement_weighted, from_rollup), members in groups.items():
+        specs = [_filters(reqs[i]) for i in members]
+        if from_rollup:
+            with metrics.stage('rollup_aggregate_batch', rows_in=len(snap.rollup.daily)) as s:
+                out = snap.rollup.aggregate_batch(specs, freq=freq, by_cols=BY_COLS, engagement_weighted=engagement_weighted)
+                s.rows_out = sum(len(agg) for agg in out)
+        else:
+            with metrics.stage('aggregate_batch', rows_in=len(snap.df)) as s:
+                out = processor.aggregate_batch(snap.df, specs, freq=freq, by_cols=BY_COLS,
+                                                engagement_weighted=engagement_weighted, index=snap.index)
+                s.rows_out = sum(len(agg) for agg in out)
+        for i, agg in zip(members, out):
+            aggs[i] = agg
+    return aggs
+
+def _analyze_batch(snap, reqs: List[AnalyzeRequest]) -> list:
+    """Bodies as _analyze() returns them; a request it would reject gets {"status_code", "detail"} instead."""
+    bodies, valid = [None] * len(reqs), []
+    # bad time bounds fail their own query before the rest are grouped and aggregated
+    for i, req in enumerate(reqs):
+        try:
+            _check_bounds(req)
+            valid.append(i)
+        except HTTPException as e:
+            bodies[i] = {"status_code": e.status_code, "detail": e.detail}
+    for i, agg in zip(valid, _aggregate_batch(snap, [reqs[i] for i in valid])):
+        try:
+            bodies[i] = _summarize(snap, reqs[i], agg)
+        except HTTPException as e:
+            bodies[i] = {"status_code": e.status_code, "detail": e.detail}
+    return bodies
+
+@app.post("/analyze_batch")
+async def analyze_batch(req: BatchRequest):
+    """
+    Answer many /analyze_multi queries at once: queries sharing freq, metric and time
+    range are aggregated together in one pass and each answer is sliced out of it.
+    Results come back in query order, each shaped like the /analyze_multi response, or
+    {"filters", "error": {"status_code", "detail"}} for a query that would fail alone.
+    """
+    if any(q.format == 'arrow' for q in req.queries):
+        raise HTTPException(status_code=422, detail="format 'arrow' is not supported by /analyze_batch")
+    metrics.label(endpoint='/analyze_batch')
+    snap = await run_in_pool(current_snapshot)
+    # answers are cached per query under the /analyze_multi key, so both endpoints share them
+    keys = [('analyze_multi', snap.version) + request_key(q) for q in req.queries]
+    bodies = results.get_many(keys)
+    missing = {key: q for key, q in zip(keys, req.queries) if key not in bodies}
+    if missing:
+        computed = await run_in_pool(_analyze_batch, snap, list(missing.values()))
+        for key, body in zip(missing, computed):
+            bodies[key] = body
+            if "status_code" not in body:
+                results.put(key, body)
+
+    answers = []
+    for key, q in zip(keys, req.queries):
+        filters = {"keywords": q.keywords, "platforms": q.platforms, "content_types": q.content_types, "regions": q.regions}
+        body = bodies[key]
+        if "status_code" in body:
+            answers.append({"filters": filters, "error": body})
+        else:
+            answers.append({"dataset_version": body["dataset_version"], "filters": filters,
+                            **{k: v for k, v in body.items() if k != "dataset_version"}})
+    payload = {"dataset_version": snap.version, "results": answers}
+    if any(q.format == 'columnar' for q in req.queries):
+        from mediapulse.serialization import dumps
+        return Response(content=await run_in_pool(_encode, dumps, payload), media_type='application/json')
+    return payload
+
+def _region_summary(snap, region: str) -> dict:
+    with metrics.stage('region_top_content', rows_in=len(snap.df)) as s:
+        summary = analytics.region_top_content(snap.df, region)
+        s.rows_out = len(summary)
     if summary.empty:
         raise HTTPException(status_code=404, detail="No data for region")
-    return {"region": region, "top_content_types": summary.to_dict(orient='records')}
+    return {"dataset_version": snap.version, "region": region, "top_content_types": summary.to_dict(orient='records')}
+
+@app.get("/region_summary/{region}")
+async def region_summary(region: str):
+    metrics.label(endpoint='/region_summary')
+    snap = await run_in_pool(current_snapshot)
+    # the echoed region keeps the caller's spelling, so it is part of the key
+    key = ('region_summary', snap.version, region)
+    return await results.get_or_compute(key, lambda: run_in_pool(_region_summary, snap, region))
+
+# (freq, last_n_periods, engagement_weighted) -> (dataset version, rows, window). A snapshot
+# appended to that version slides a copy of the window over the new rows; any other
+# version rebuilds it from the rollup
+trending_windows = {}
+
+def _trending_window(snap, freq: str, last_n_periods: int, engagement_weighted: bool) -> 'TrendingWindow':
+    from mediapulse.processor import period_start
+    from mediapulse.trending import TrendingWindow
+    slot = (freq, last_n_periods, engagement_weighted)
+    cached = trending_windows.get(slot)
+    if cached is not None and cached[0] == snap.version:
+        return cached[2]
+    metric = 'engagement' if engagement_weighted else 'count'
+    if cached is not None and snap.parent == cached[0]:
+        new = snap.df.iloc[cached[1]:]
+        with metrics.stage('trending_push', rows_in=len(new)) as s:
+            # readers of the previous version may still hold the cached window
+            window = cached[2].copy()
+            window.add(pd.DataFrame({'keyword': new['keyword'], 'datetime': period_start(new['datetime'], freq), 'count': new[metric]}))
+            s.rows_out = len(window)
+    else:
+        table = snap.rollup.table(freq)
+        with metrics.stage('trending_window', rows_in=len(table)) as s:
+            window = TrendingWindow.from_frame(table[['keyword', 'datetime', metric]].rename(columns={metric: 'count'}), last_n_periods)
+            s.rows_out = len(window)
+    trending_windows[slot] = (snap.version, len(snap), window)
+    return window
+
+def _trending(snap, freq: str, last_n_periods: int, top_k: int, engagement_weighted: bool) -> dict:
+    window = _trending_window(snap, freq, last_n_periods, engagement_weighted)
+    periods = window.periods
+    with metrics.stage('top_k', rows_in=len(window)) as s:
+        top = window.top(top_k)
+        s.rows_out = len(top)
+    return {
+        "dataset_version": snap.version,
+        "freq": freq,
+        "periods": [p.isoformat() for p in periods[:1] + periods[-1:]],
+        "top": top.to_dict(orient='records')
+    }
+
+@app.get("/trending")
+async def trending(freq: str = 'D', last_n_periods: int = 7, top_k: int = 10, engagement_weighted: bool = False):
+    """Top keywords by volume over the last N periods (first and last period of the window in `periods`)."""
+    from mediapulse.rollup import ROLLUP_FREQS
+    if freq not in ROLLUP_FREQS:
+        raise HTTPException(status_code=422, detail=f"freq must be one of {list(ROLLUP_FREQS)}")
+    if last_n_periods < 1 or top_k < 1:
+        raise HTTPException(status_code=422, detail="last_n_periods and top_k must be positive")
+    metrics.label(endpoint='/trending', freq=freq)
+    snap = await run_in_pool(current_snapshot)
+    key = ('trending', snap.version, freq, last_n_periods, top_k, engagement_weighted)
+    return await results.get_or_compute(key, lambda: run_in_pool(_trending, snap, freq, last_n_periods, top_k, engagement_weighted))
+
+
+class ExportRequest(AnalyzeRequest):
+    # same filters as /analyze_multi; the full table is streamed instead of a preview
+    format: Literal['csv', 'ndjson', 'parquet'] = 'csv'
+    table: Literal['agg', 'spikes'] = 'agg'
+    # page size in rows (default: everything after the cursor) and the X-Next-Cursor of the previous page
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+
+EXPORT_CHUNK_ROWS = 10_000
+
+def encode_cursor(version: str, position: int, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{version}:{position}:{offset}".encode('ascii')).decode('ascii')
+
+def decode_cursor(cursor: str, version: str) -> Tuple[int, int]:
+    """(keyword position, row offset within that keyword) of a cursor issued for version."""
+    try:
+        cursor_version, position, offset = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').rsplit(':', 2)
+        position, offset = int(position), int(offset)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if position < 0 or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # positions are only meaningful against the dataset version they were issued for
+    if cursor_version != version:
+        raise HTTPException(status_code=409, detail="Dataset changed since the cursor was issued; restart the export")
+    return position, offset
+
+def _export_keywords(snap, req: ExportRequest) -> List[str]:
+    """Keyword categories an export walks, in output order (both tables are sorted by keyword first)."""
+    from mediapulse.processor import isin_ci
+    categories = pd.Series(snap.df['keyword'].cat.categories.astype(str))
+    if req.keywords:
+        categories = categories[isin_ci(categories, req.keywords)]
+    return categories.tolist()
+
+def _export_slices(snap, req: ExportRequest, keywords: List[str], position: int):
+    """
+    Yield (keyword position, rows) for each keyword from position on that has rows. The
+    table for those keywords is aggregated in one pass and handed out keyword by
+    keyword; nothing of it is kept once the response is sent.
+    """
+    wanted = keywords[position:]
+    if not wanted:
+        return
+    agg = _aggregate(snap, req.model_copy(update={'keywords': wanted}))
+    # keyword filters match case-insensitively; keep exactly the wanted categories
+    exact = agg['keyword'].astype(str).isin(wanted).to_numpy()
+    table = agg if exact.all() else agg[exact]
+    if req.table == 'spikes':
+        with metrics.stage('spike_detection', rows_in=len(table)) as s:
+            table = analytics.spike_detection(table)
+            s.rows_out = len(table)
+    slot = {keyword: position + i for i, keyword in enumerate(wanted)}
+    for keyword, rows in table.groupby('keyword', observed=True, sort=False):
+        yield slot[str(keyword)], rows
+
+def _cursor_skip(pos: int, rows, position: int, offset: int) -> int:
+    """Rows to skip of the first slice (pos, rows) an export resumes at for a cursor at (position, offset)."""
+    # cursors are only issued for a position inside a keyword's rows
+    if offset and (pos != position or offset >= len(rows)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+def _export_page(snap, req: ExportRequest, keywords: List[str], position: int, offset: int):
+    """Frames of the page starting at (position, offset) - at most req.limit rows - and the next cursor position."""
+    frames, n = [], 0
+    slices = _export_slices(snap, req, keywords, position)
+    for pos, rows in slices:
+        skip = 0 if frames else _cursor_skip(pos, rows, position, offset)
+        take = min(len(rows) - skip, req.limit - n)
+        frames.append(rows.iloc[skip:skip + take])
+        n += take
+        if skip + take < len(rows):
+            return frames, (pos, skip + take)
+        if n == req.limit:
+            # only hand out a cursor if some keyword after this one has rows
+            following = next(slices, None)
+            return frames, (None if following is None else (following[0], 0))
+    return frames, None
+
+def _export_start(snap, req: ExportRequest, position: int, offset: int):
+    """Body frames (a list for a page, a lazy iterator without limit) and the next cursor position."""
+    keywords = _export_keywords(snap, req)
+    if req.limit is not None:
+        frames, following = _export_page(snap, req, keywords, position, offset)
+    else:
+        slices = _export_slices(snap, req, keywords, position)
+        # compute the first slice up front so an empty export is a 404, not an empty body
+        head = next(slices, None)
+        frames = [] if head is None else itertools.chain([head[1].iloc[_cursor_skip(*head, position, offset):]],
+                                                         (rows for _, rows in slices))
+        following = None
+    if not frames:
+        if (position, offset) == (0, 0):
+            raise HTTPException(status_code=404, detail="No data for filters")
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return frames, following
+
+@app.post("/export")
+async def export(req: ExportRequest):
+    """
+    Stream the aggregated rows (table='agg') or spikes for the filters as CSV, NDJSON or
+    Parquet. The table is aggregated in one pass and sent keyword by keyword; pages
+    of `limit` rows are chained with the X-Next-Cursor response header. Exports aren't
+    cached: each page aggregates the keywords from its cursor on.
+    """
+    if req.limit is not None and req.limit < 1:
+        raise HTTPException(status_code=422, detail="limit must be positive")
+    metrics.label(endpoint='/export', freq=req.freq)
+    snap = await run_in_pool(current_snapshot)
+    position, offset = decode_cursor(req.cursor, snap.version) if req.cursor else (0, 0)
+    frames, following = await run_in_pool(_export_start, snap, req, position, offset)
+
+    headers = {"X-Dataset-Version": snap.version}
+    if following is not None:
+        headers["X-Next-Cursor"] = encode_cursor(snap.version, *following)
+    from mediapulse.serialization import EXPORT_MEDIA_TYPES, iter_csv, iter_ndjson, iter_parquet
+    if req.format == 'parquet':
+        body = iter_parquet(frames, EXPORT_CHUNK_ROWS, metadata={"dataset_version": snap.version})
+    elif req.format == 'ndjson':
+        body = iter_ndjson(frames, EXPORT_CHUNK_ROWS)
+    else:
+        body = iter_csv(frames, EXPORT_CHUNK_ROWS)
+    # a plain generator: Starlette iterates it on its threadpool, off the event loop
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[req.format], headers=headers)
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage/request histograms and response cache counters in the Prometheus text format."""
+    extra = []
+    for name, value in (('hits', results.hits), ('misses', results.misses), ('coalesced', results.coalesced)):
+        extra += [f"# TYPE mediapulse_result_cache_{name}_total counter", f"mediapulse_result_cache_{name}_total {value}"]
+    return PlainTextResponse(metrics.render(extra), media_type='text/plain; version=0.0.4; charset=utf-8')
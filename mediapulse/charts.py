@@ -1,20 +1,34 @@
-import plotly.graph_objects as go
-import plotly.express as px
-import matplotlib.pyplot as plt
+import os
+import re
+from typing import Dict, List, Optional
+import numpy as np
 import pandas as pd
+from mediapulse.downsample import box_stats, downsample_frame, downsample_indices, lttb_indices
 
+# plotly and matplotlib are imported inside the methods that draw, so importing this module
+# (or a caller that only needs the data helpers) doesn't pay for them
 class ChartRenderer:
+    def __init__(self, max_points: int = 2000):
+        # per-trace point budget for line/area charts (None = send every point)
+        self.max_points = max_points
+
     def plotly_time_series(self, df: pd.DataFrame, keyword: str, moving_avg: list = None, color_col: str = None, title: str = None):
+        import plotly.graph_objects as go
         dfp = df.copy()
         dfp = dfp.sort_values('datetime')
         fig = go.Figure()
         if color_col and color_col in dfp.columns:
-            for k, grp in dfp.groupby(color_col):
+            for k, grp in dfp.groupby(color_col, observed=True):
+                grp = downsample_frame(grp, 'datetime', 'count', self.max_points)
                 fig.add_trace(go.Scatter(x=grp['datetime'], y=grp['count'], mode='lines+markers', name=str(k)))
         else:
-            fig.add_trace(go.Scatter(x=dfp['datetime'], y=dfp['count'], mode='lines+markers', name=f'{keyword}'))
+            line = downsample_frame(dfp, 'datetime', 'count', self.max_points)
+            fig.add_trace(go.Scatter(x=line['datetime'], y=line['count'], mode='lines+markers', name=f'{keyword}'))
         if moving_avg is not None:
-            fig.add_trace(go.Scatter(x=dfp['datetime'], y=moving_avg, mode='lines', name='Moving Avg', line=dict(dash='dash')))
+            ma_x, ma_y = dfp['datetime'].to_numpy(), np.asarray(moving_avg, dtype=float)
+            # a moving average is smooth, so plain LTTB (no forced peaks) is enough
+            keep = lttb_indices(ma_x, ma_y, self.max_points) if self.max_points else np.arange(len(ma_y))
+            fig.add_trace(go.Scatter(x=ma_x[keep], y=ma_y[keep], mode='lines', name='Moving Avg', line=dict(dash='dash')))
         fig.update_layout(title=title or f"{keyword} — Trend", template='plotly_dark', xaxis_title='Date', yaxis_title='Count')
         return fig
 
@@ -23,8 +37,15 @@ class ChartRenderer:
         df must be aggregated: columns [date_col, category_col, count]
         Returns stacked area chart per category.
         """
+        import plotly.express as px
         dfp = df.copy()
         dfp[date_col] = pd.to_datetime(dfp[date_col])
+        if self.max_points:
+            # every category must keep the same dates to stack, so pick them by LTTB on the totals
+            totals = dfp.groupby(date_col, observed=True)['count'].sum().sort_index()
+            if len(totals) > self.max_points:
+                dates = totals.index[downsample_indices(totals.index.to_numpy(), totals.to_numpy(), self.max_points)]
+                dfp = dfp[dfp[date_col].isin(dates)]
         fig = px.area(dfp, x=date_col, y='count', color=category_col, line_group=category_col)
         fig.update_layout(template='plotly_dark')
         return fig
@@ -34,27 +55,108 @@ class ChartRenderer:
         Creates a simple choropleth-ready dataframe (region->value). If regions are countries or states,
         you can pass to px.choropleth by mapping names to ISO codes externally.
         """
-        summary = df.groupby(region_col)['count'].sum().reset_index().rename(columns={region_col: 'region', 'count': 'value'})
+        import plotly.express as px
+        summary = df.groupby(region_col, observed=True)['count'].sum().reset_index().rename(columns={region_col: 'region', 'count': 'value'})
         # return data - visualization choice depends on region granularity
         fig = px.bar(summary.sort_values('value', ascending=False), x='region', y='value', title='Engagement by Region')
         fig.update_layout(template='plotly_dark', xaxis_tickangle=-45)
         return fig
 
-    def plotly_box_engagement(self, df: pd.DataFrame, by='platform'):
-        if by not in df.columns:
-            raise ValueError("grouping column not present")
-        fig = px.box(df, x=by, y='engagement', points='outliers', title=f'Engagement distribution by {by}')
-        fig.update_layout(template='plotly_dark')
+    def plotly_box_engagement(self, df: Optional[pd.DataFrame], by='platform', stats: Optional[pd.DataFrame] = None):
+        """Box plot of engagement by `by`; pass precomputed stats (e.g. EngagementSketches.box_stats) to skip df."""
+        import plotly.express as px
+        import plotly.graph_objects as go
+        if stats is None:
+            if by not in df.columns:
+                raise ValueError("grouping column not present")
+            # quartiles, fences and outliers are computed here; only the summary goes to the browser
+            stats = box_stats(df, by, 'engagement')
+        fig = go.Figure()
+        colors = px.colors.qualitative.Plotly
+        for i, row in enumerate(stats.itertuples(index=False)):
+            name, color = str(getattr(row, by)), colors[i % len(colors)]
+            fig.add_trace(go.Box(x=[name], q1=[row.q1], median=[row.median], q3=[row.q3], lowerfence=[row.lowerfence],
+                                 upperfence=[row.upperfence], name=name, boxpoints=False, legendgroup=name, marker_color=color))
+            if len(row.outliers):
+                fig.add_trace(go.Scatter(x=[name] * len(row.outliers), y=row.outliers, mode='markers', name=name,
+                                         legendgroup=name, showlegend=False, marker_color=color))
+        fig.update_layout(title=f'Engagement distribution by {by}', template='plotly_dark', xaxis_title=by, yaxis_title='engagement')
         return fig
 
     def matplotlib_export(self, df: pd.DataFrame, keyword: str, filepath: str):
+        import matplotlib.pyplot as plt
         fig, ax = plt.subplots(figsize=(10,4))
-        ax.plot(pd.to_datetime(df['datetime']), df['count'], marker='o', label=keyword)
-        ax.set_title(f"{keyword} Trend")
-        ax.set_xlabel("Date")
-        ax.set_ylabel("Count")
-        ax.legend()
-        fig.autofmt_xdate()
+        _draw_trend(fig, ax, df, keyword)
         fig.savefig(filepath, bbox_inches='tight', dpi=150)
         plt.close(fig)
         return filepath
+
+    def matplotlib_export_batch(self, agg: pd.DataFrame, keywords: List[str], out_dir: str = 'reports/figures',
+                                max_workers: int = None) -> Dict[str, str]:
+        """
+        Export one trend PNG per keyword (matched case-insensitively against agg['keyword'])
+        into out_dir, rendering on a process pool. Each worker draws on a single Agg
+        figure that it clears between keywords instead of creating a new one, and each
+        file is byte-identical to matplotlib_export(agg rows of that keyword, ...).
+        Returns {keyword: filepath}; keywords without rows are skipped.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        lower = agg['keyword'].astype(str).str.lower()
+        jobs, used = [], set()
+        for keyword in dict.fromkeys(keywords):
+            rows = agg.loc[(lower == keyword.lower()).to_numpy(), ['datetime', 'count']]
+            if rows.empty:
+                continue
+            jobs.append((rows, keyword, os.path.join(out_dir, _figure_filename(keyword, used))))
+        if not jobs:
+            return {}
+        workers = max(1, min(max_workers or os.cpu_count() or 1, len(jobs)))
+        if workers == 1:
+            _render_batch(jobs)
+        else:
+            # a few batches per worker: amortizes pickling without leaving workers idle at the end
+            size = -(-len(jobs) // (workers * 4))
+            # started like the shard workers: never by forking this (possibly threaded) process
+            from mediapulse.parallel import _pool
+            with _pool(workers) as pool:
+                list(pool.map(_render_batch, [jobs[i:i + size] for i in range(0, len(jobs), size)]))
+        return {keyword: path for _, keyword, path in jobs}
+
+
+def _draw_trend(fig, ax, df: pd.DataFrame, keyword: str):
+    ax.plot(pd.to_datetime(df['datetime']), df['count'], marker='o', label=keyword)
+    ax.set_title(f"{keyword} Trend")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Count")
+    ax.legend()
+    fig.autofmt_xdate()
+
+
+def _figure_filename(keyword: str, used: set) -> str:
+    stem = re.sub(r'[^A-Za-z0-9._-]+', '_', keyword).strip('._') or 'keyword'
+    name, n = stem, 1
+    while name.lower() in used:
+        n += 1
+        name = f"{stem}-{n}"
+    used.add(name.lower())
+    return f"{name}.png"
+
+
+_worker_figure = None
+
+
+def _render_batch(jobs) -> List[str]:
+    global _worker_figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    # a pyplot-free figure on the Agg canvas, reused for every chart this process renders
+    if _worker_figure is None:
+        fig = Figure(figsize=(10,4))
+        FigureCanvasAgg(fig)
+        _worker_figure = fig, fig.add_subplot()
+    fig, ax = _worker_figure
+    for df, keyword, filepath in jobs:
+        ax.clear()
+        _draw_trend(fig, ax, df, keyword)
+        fig.savefig(filepath, bbox_inches='tight', dpi=150)
+    return [filepath for _, _, filepath in jobs]
@@ -0,0 +1,95 @@
+# mediapulse/downsample.py
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+def _as_float(x) -> np.ndarray:
+    x = np.asarray(x)
+    if x.dtype.kind == 'M':
+        return x.astype('datetime64[ns]').astype('int64').astype(float)
+    return x.astype(float)
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: positions of n_out points of the series (x sorted
+    ascending) that best keep its visual shape. The first and last points are always
+    kept; each bucket in between contributes the point forming the largest triangle
+    with the previously kept point and the mean of the next bucket.
+    """
+    x, y = _as_float(x), np.nan_to_num(_as_float(y))
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1], dtype=np.intp)[:max(n_out, 0)]
+    # n - 2 inner points split into n_out - 2 buckets
+    edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(np.intp) + 1
+    edges[-1] = n - 1
+    out = np.empty(n_out, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt = slice(edges[i + 1], edges[i + 2])
+            cx, cy = x[nxt].mean(), y[nxt].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def downsample_indices(x, y, max_points: int, n_peaks: Optional[int] = None) -> np.ndarray:
+    """
+    Sorted positions of at most max_points points: the n_peaks highest values (default
+    5% of the budget) are always kept so spikes survive, and LTTB picks the rest.
+    """
+    n = len(x)
+    if not max_points or n <= max_points:
+        return np.arange(n)
+    if n_peaks is None:
+        n_peaks = max(1, max_points // 20)
+    n_peaks = min(n_peaks, max_points - 3) if max_points > 3 else 0
+    yv = np.nan_to_num(_as_float(y), nan=-np.inf)
+    peaks = np.argpartition(yv, n - n_peaks)[n - n_peaks:] if n_peaks > 0 else np.empty(0, dtype=np.intp)
+    return np.union1d(lttb_indices(x, y, max_points - n_peaks), peaks)
+
+
+def downsample_frame(df: pd.DataFrame, x_col: str, y_col: str, max_points: int, group_col: str = None) -> pd.DataFrame:
+    """Downsample each trace of df (one per group_col value, or the whole frame) to max_points rows, in x order."""
+    df = df.sort_values(x_col, kind='mergesort')
+    if not max_points or (group_col is None and len(df) <= max_points):
+        return df
+    if group_col is None:
+        return df.iloc[downsample_indices(df[x_col].to_numpy(), df[y_col].to_numpy(), max_points)]
+    parts = [grp.iloc[downsample_indices(grp[x_col].to_numpy(), grp[y_col].to_numpy(), max_points)]
+             for _, grp in df.groupby(group_col, observed=True, sort=False)]
+    return pd.concat(parts) if parts else df
+
+
+def box_stats(df: pd.DataFrame, by: str, value_col: str = 'engagement', max_outliers: int = 200) -> pd.DataFrame:
+    """
+    Per-group box plot summary computed server-side: q1, median, q3, the Tukey fences
+    (whiskers end at the most extreme values within 1.5 IQR of the box) and up to
+    max_outliers outliers per group, the most extreme first. Quartiles use linear
+    interpolation, like plotly's default.
+    """
+    rows = []
+    for key, values in df.groupby(by, observed=True, sort=True)[value_col]:
+        v = values.dropna().to_numpy(dtype=float)
+        if len(v) == 0:
+            continue
+        q1, median, q3 = np.percentile(v, [25, 50, 75])
+        iqr = q3 - q1
+        inside = v[(v >= q1 - 1.5 * iqr) & (v <= q3 + 1.5 * iqr)]
+        outliers = v[(v < q1 - 1.5 * iqr) | (v > q3 + 1.5 * iqr)]
+        if len(outliers) > max_outliers:
+            outliers = outliers[np.argsort(-np.abs(outliers - median), kind='mergesort')[:max_outliers]]
+        rows.append({by: key, 'q1': q1, 'median': median, 'q3': q3,
+                     'lowerfence': inside.min(), 'upperfence': inside.max(), 'n': len(v), 'outliers': outliers})
+    return pd.DataFrame(rows, columns=[by, 'q1', 'median', 'q3', 'lowerfence', 'upperfence', 'n', 'outliers'])
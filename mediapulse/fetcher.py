@@ -1,7 +1,19 @@
 # mediapulse/fetcher.py
+import glob
+import hashlib
+import io
+import os
 from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
 import pandas as pd
-from dateutil import parser
+
+# bytes at the start of a file and just before its watermark that are fingerprinted to detect rewrites
+_TAIL_BYTES = 256
+
+
+class SourceRewritten(Exception):
+    """A source changed in a way other than appending rows (truncated, replaced or removed)."""
+
 
 class DataFetcher:
     """
@@ -9,6 +21,9 @@ class DataFetcher:
       - a datetime column (name guessed from common names)
       - a keyword/topic column
       - optionally a count column (mentions) otherwise will default to 1 per row (implicit mention)
+
+    csv_path may also be a directory (every *.csv in it) or a glob pattern, for data that
+    arrives as many shards; the shards are read in sorted order and concatenated.
     """
 
     def __init__(self, csv_path: str = "D:\\MediaPulse - Trending Content Analyzer\\data\\Viral_Social_Media_Trends_with_DateTime.csv"):
@@ -27,27 +42,28 @@ class DataFetcher:
             'count': count_candidates[0] if count_candidates else None
         }
 
-    def fetch(self) -> pd.DataFrame:
-        if not self.csv_path.exists():
-            raise FileNotFoundError(f"CSV not found at {self.csv_path}")
-        df = pd.read_csv(self.csv_path)
+    def _find(self, columns, col_keywords):
+        for c in columns:
+            cl = c.lower()
+            for kw in col_keywords:
+                if kw in cl:
+                    return c
+        return None
+
+    def _resolve_columns(self, df: pd.DataFrame) -> dict:
+        """
+        Decide from the header which source columns to read and what to call them.
+        Only column names are inspected, so a zero-row frame is enough.
+        """
         cols = self._guess_columns(df)
         # standardize core column names
         rename_map = {cols['datetime']: 'datetime_raw', cols['keyword']: 'keyword'}
 
         # detect optional columns and normalize names so downstream code can use them
-        def _find(col_keywords):
-            for c in df.columns:
-                cl = c.lower()
-                for kw in col_keywords:
-                    if kw in cl:
-                        return c
-            return None
-
-        platform_col = _find(['platform', 'source', 'site'])
-        content_col = _find(['content_type', 'content type', 'content', 'type'])
-        region_col = _find(['region', 'country', 'location'])
-        engagement_col = _find(['engagement_level', 'engagement', 'likes', 'shares', 'engagement_score'])
+        platform_col = self._find(df.columns, ['platform', 'source', 'site'])
+        content_col = self._find(df.columns, ['content_type', 'content type', 'content', 'type'])
+        region_col = self._find(df.columns, ['region', 'country', 'location'])
+        engagement_col = self._find(df.columns, ['engagement_level', 'engagement', 'likes', 'shares', 'engagement_score'])
 
         if platform_col:
             rename_map[platform_col] = 'platform'
@@ -58,12 +74,13 @@ class DataFetcher:
         if engagement_col:
             # normalize engagement to a single name so analytics can rely on it
             rename_map[engagement_col] = 'engagement'
+        if cols['count'] and cols['count'] not in rename_map:
+            rename_map[cols['count']] = 'count'
+        return rename_map
 
+    def _standardize(self, df: pd.DataFrame, rename_map: dict) -> pd.DataFrame:
         df = df.rename(columns=rename_map)
-
-        if cols['count']:
-            df = df.rename(columns={cols['count']: 'count'})
-        else:
+        if 'count' not in df.columns:
             # treat each row as 1 mention if no count column
             df['count'] = 1
 
@@ -72,5 +89,123 @@ class DataFetcher:
         for optional in ('platform', 'content_type', 'region', 'engagement'):
             if optional in df.columns:
                 out_cols.append(optional)
+        return df[out_cols]
+
+    def sources(self) -> List[Path]:
+        """CSV files behind csv_path: the file itself, the *.csv files of a directory, or glob matches."""
+        path = self.csv_path
+        if path.is_dir():
+            files = sorted(path.glob('*.csv'))
+        elif glob.has_magic(str(path)):
+            files = sorted(Path(p) for p in glob.glob(str(path)))
+        else:
+            files = [path] if path.exists() else []
+        if not files:
+            raise FileNotFoundError(f"CSV not found at {self.csv_path}")
+        return files
+
+    def signature(self) -> Tuple[int, int, int]:
+        """(latest mtime_ns, total size, file count) over all sources; changes when any shard does."""
+        stats = [os.stat(p) for p in self.sources()]
+        return (max(st.st_mtime_ns for st in stats), sum(st.st_size for st in stats), len(stats))
+
+    def _read_source(self, path: Path) -> pd.DataFrame:
+        rename_map = self._resolve_columns(pd.read_csv(path, nrows=0))
+        # only materialize the columns we keep
+        df = pd.read_csv(path, usecols=list(rename_map))
+        return self._standardize(df, rename_map)
+
+    def fetch(self) -> pd.DataFrame:
+        frames = [self._read_source(path) for path in self.sources()]
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+
+    def fetch_chunks(self, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+        """
+        Stream the dataset in chunks of `chunksize` rows, each standardized like fetch().
+        Columns are detected once per file from its header; only the selected ones are read,
+        so peak memory is bounded by the chunk size rather than the file size.
+        """
+        for path in self.sources():
+            rename_map = self._resolve_columns(pd.read_csv(path, nrows=0))
+            with pd.read_csv(path, usecols=list(rename_map), chunksize=chunksize) as reader:
+                for chunk in reader:
+                    yield self._standardize(chunk, rename_map)
+
+    def _mark(self, f, offset: int) -> dict:
+        h = hashlib.sha1()
+        f.seek(0)
+        h.update(f.read(min(offset, _TAIL_BYTES)))
+        f.seek(max(0, offset - _TAIL_BYTES))
+        h.update(f.read(min(offset, _TAIL_BYTES)))
+        return {'offset': offset, 'digest': h.hexdigest(), 'mtime_ns': os.fstat(f.fileno()).st_mtime_ns}
+
+    def _rewritten(self, f, mark: dict) -> bool:
+        st = os.fstat(f.fileno())
+        if st.st_size < mark['offset']:
+            return True
+        # appending always grows a file; a touch at the same size means it was rewritten
+        if st.st_size == mark['offset'] and st.st_mtime_ns != mark['mtime_ns']:
+            return True
+        return self._mark(f, mark['offset'])['digest'] != mark['digest']
+
+    def watermark(self) -> Dict[str, dict]:
+        """
+        High-water mark for everything currently in the source(s): per file, the byte
+        offset read up to, its mtime and a fingerprint of the first bytes and of the bytes
+        just before the offset. Take it before a full fetch() and pass it to fetch_since()
+        later to read only what was appended.
+        """
+        marks = {}
+        for path in self.sources():
+            with open(path, 'rb') as f:
+                marks[str(path)] = self._mark(f, os.fstat(f.fileno()).st_size)
+        return marks
+
+    def fetch_since(self, watermark: Dict[str, dict]) -> Tuple[pd.DataFrame, Dict[str, dict]]:
+        """
+        Rows appended since watermark (see watermark()), standardized like fetch(), and the
+        new watermark. New shards are read whole. Only complete lines are consumed; a
+        partially written last line is left for the next call.
+
+        Raises SourceRewritten when a file shrank, was modified without growing, has
+        different fingerprinted bytes, or a shard disappeared - the caller has to fall
+        back to a full fetch(). Edits in the middle of a file that also grows are not
+        detected.
+        """
+        files = self.sources()
+        missing = set(watermark) - {str(p) for p in files}
+        if missing:
+            raise SourceRewritten(f"Source removed: {sorted(missing)[0]}")
+        frames, marks = [], {}
+        for path in files:
+            mark = watermark.get(str(path))
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if mark is not None and self._rewritten(f, mark):
+                    raise SourceRewritten(f"{path} was rewritten")
+                offset = mark['offset'] if mark is not None else 0
+                f.seek(offset)
+                data = f.read(size - offset)
+                complete = data[:data.rfind(b'\n') + 1]
+                if complete:
+                    f.seek(0)
+                    header = f.readline()
+                    body = complete if offset > 0 else complete[len(header):]
+                    offset += len(complete)
+                    if body.strip():
+                        frames.append(self._read_buffer(header, body))
+                marks[str(path)] = self._mark(f, offset)
+        if not frames:
+            return self._read_buffer(self._first_line(files[0]), b''), marks
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0], marks
+
+    def _first_line(self, path: Path) -> bytes:
+        with open(path, 'rb') as f:
+            return f.readline()
 
-        return df[out_cols].copy()
+    def _read_buffer(self, header: bytes, body: bytes) -> pd.DataFrame:
+        rename_map = self._resolve_columns(pd.read_csv(io.BytesIO(header), nrows=0))
+        df = pd.read_csv(io.BytesIO(header + body), usecols=list(rename_map))
+        return self._standardize(df, rename_map)
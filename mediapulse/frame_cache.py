@@ -0,0 +1,112 @@
+# mediapulse/frame_cache.py
+import hashlib
+import json
+import os
+import re
+import warnings
+from pathlib import Path
+
+import pandas as pd
+
+from mediapulse.fetcher import DataFetcher
+from mediapulse.parallel import load_cleaned
+from mediapulse.processor import DataProcessor
+
+# bump whenever DataProcessor.clean() changes the shape/dtypes of its output so
+# existing cache files are not picked up by newer code
+CACHE_SCHEMA_VERSION = 2
+
+
+class FrameCache:
+    """
+    On-disk columnar cache of the cleaned dataset.
+
+    Cleaned frames are written as Arrow/Feather (default, uncompressed so it can be
+    memory-mapped) or Parquet files, named after a hash of the source file and the
+    processor's cleaning config. A change to either produces a new key, so stale
+    entries are never read; they are removed when the new entry is written.
+
+    hash_content=False keys on the source path/size/mtime, which is instant; set it to
+    True to hash the file bytes instead (slower, but survives copies and touches).
+    """
+
+    def __init__(self, cache_dir: str = None, fmt: str = 'feather', hash_content: bool = False):
+        if fmt not in ('feather', 'parquet'):
+            raise ValueError(f"Unsupported cache format: {fmt}")
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.fmt = fmt
+        self.hash_content = hash_content
+
+    def _dir_for(self, source: Path) -> Path:
+        if self.cache_dir:
+            return self.cache_dir
+        return (source if source.is_dir() else source.parent) / '.mediapulse_cache'
+
+    def _source_digest(self, files) -> str:
+        h = hashlib.sha1()
+        for path in files:
+            if self.hash_content:
+                with open(path, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        h.update(block)
+            else:
+                st = os.stat(path)
+                h.update(f"{path.resolve()}|{st.st_size}|{st.st_mtime_ns}".encode('utf-8'))
+        return h.hexdigest()
+
+    def key(self, fetcher: DataFetcher, processor: DataProcessor) -> str:
+        config = {
+            'schema': CACHE_SCHEMA_VERSION,
+            'datetime_formats': processor.datetime_formats,
+            'source': self._source_digest(fetcher.sources()),
+        }
+        return hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    def path_for(self, source: Path, key: str) -> Path:
+        ext = 'feather' if self.fmt == 'feather' else 'parquet'
+        # directory/glob sources: keep the name filesystem-friendly and free of '-'
+        name = re.sub(r'[^A-Za-z0-9_.]', '_', source.stem if not source.is_dir() else source.name)
+        return self._dir_for(source) / f"{name}-{key}.{ext}"
+
+    def read(self, path: Path) -> pd.DataFrame:
+        if self.fmt == 'feather':
+            from pyarrow import feather
+            table = feather.read_table(path, memory_map=True)
+        else:
+            import pyarrow.parquet as pq
+            table = pq.read_table(path, memory_map=True)
+        return table.to_pandas()
+
+    def write(self, df: pd.DataFrame, path: Path):
+        import pyarrow as pa
+        # keep the index: clean() drops rows, and callers may rely on the original labels
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        if self.fmt == 'feather':
+            from pyarrow import feather
+            feather.write_feather(table, tmp, compression='uncompressed')
+        else:
+            import pyarrow.parquet as pq
+            pq.write_table(table, tmp)
+        os.replace(tmp, path)
+        # drop entries for older versions of the same source
+        prefix = path.stem.rsplit('-', 1)[0]
+        for stale in path.parent.glob(f"{prefix}-*{path.suffix}"):
+            if stale != path and len(stale.stem) == len(path.stem):
+                stale.unlink(missing_ok=True)
+
+    def load(self, fetcher: DataFetcher, processor: DataProcessor, max_workers: int = None) -> pd.DataFrame:
+        """
+        Return the cleaned dataset for fetcher's source(s), from cache when possible. On a
+        miss, sharded sources are cleaned in parallel (see parallel.load_cleaned).
+        """
+        path = self.path_for(Path(fetcher.csv_path), self.key(fetcher, processor))
+        if path.exists():
+            return self.read(path)
+        df = load_cleaned(fetcher, processor, max_workers=max_workers)
+        try:
+            self.write(df, path)
+        except OSError as e:
+            warnings.warn(f"Could not write frame cache {path}: {e}")
+        return df
@@ -0,0 +1,148 @@
+# mediapulse/index.py
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from mediapulse.processor import CATEGORY_COLUMNS
+
+
+class DatasetIndex:
+    """
+    Inverted index over a cleaned frame, built once per dataset snapshot.
+
+    Rows are ordered by datetime (stable), so a time range is a contiguous slice of
+    positions found by binary search. For every value of each categorical dimension
+    the index keeps a posting list: the sorted time-ordered positions holding that
+    value. A query walks the postings of its most selective dimension, trims them to
+    the time range, and checks the remaining dimensions by code lookup, so its cost
+    follows the size of the answer rather than the size of the dataset.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        times = df['datetime'].to_numpy()
+        # time-ordered position -> row position in df
+        self.order = np.argsort(times, kind='stable')
+        self.times = times[self.order]
+        self._dims = {}
+        for col in CATEGORY_COLUMNS:
+            if col not in df.columns:
+                continue
+            values = df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                codes, cats = values.cat.codes.to_numpy(), values.cat.categories
+            else:
+                codes, cats = pd.factorize(values)
+            codes = codes[self.order]
+            # postings[bounds[c]:bounds[c + 1]] are the positions of code c, ascending
+            postings = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[postings], np.arange(len(cats) + 1))
+            self._dims[col] = (pd.Index(cats).astype(str).str.lower(), codes, postings, bounds)
+
+    def extend(self, df: pd.DataFrame) -> 'DatasetIndex':
+        """
+        Index of df, where df is this index's frame with rows appended (row positions
+        from n_rows on, e.g. concat_cleaned([old, new])). The new rows are inserted into
+        the time order and the posting lists - O(n) copying plus O(new log n) searches,
+        no re-sort - and the result is the same as DatasetIndex(df). Falls back to a
+        rebuild when a dimension isn't categorical or its categories aren't sorted.
+        """
+        n_old = self.n_rows
+        if any(not isinstance(df[col].dtype, pd.CategoricalDtype) for col in self._dims):
+            return DatasetIndex(df)
+        times = df['datetime'].to_numpy()[n_old:]
+        local = np.argsort(times, kind='stable')
+        times = times[local]
+        # after the old rows with equal times, like a stable sort by (time, row position)
+        at = np.searchsorted(self.times, times, 'right')
+        index = DatasetIndex.__new__(DatasetIndex)
+        index.n_rows = len(df)
+        index.times = np.insert(self.times, at, times)
+        index.order = np.insert(self.order, at, local + n_old)
+        # old time-ordered position p moves up by the new rows inserted at or before it
+        moved = np.arange(n_old) + np.searchsorted(at, np.arange(n_old), 'right')
+        added = at + np.arange(len(at))
+        index._dims = {}
+        for col, (_, old_codes, postings, bounds) in self._dims.items():
+            cats = df[col].cat.categories
+            codes = df[col].cat.codes.to_numpy()[index.order]
+            # posting entries as (code, position) keys: old ones stay in order if codes are remapped monotonically
+            old_keys = codes[moved[postings]].astype(np.int64) * index.n_rows + moved[postings]
+            new_keys = codes[added].astype(np.int64) * index.n_rows + added
+            if len(old_keys) > 1 and not (old_keys[1:] > old_keys[:-1]).all():
+                return DatasetIndex(df)
+            new_keys.sort()
+            merged = np.insert(old_keys, np.searchsorted(old_keys, new_keys), new_keys)
+            # missing values (code -1) get negative keys and stay in front of code 0, as argsort puts them
+            merged_postings = (merged % index.n_rows).astype(postings.dtype)
+            merged_bounds = np.searchsorted(merged, np.arange(len(cats) + 1, dtype=np.int64) * index.n_rows)
+            index._dims[col] = (pd.Index(cats).astype(str).str.lower(), codes, merged_postings, merged_bounds)
+        return index
+
+    def arrays(self) -> Tuple[Dict[str, np.ndarray], dict]:
+        """
+        The index as row-length arrays plus small metadata (category names, posting
+        bounds), e.g. for publishing it next to the frame; from_arrays() rebuilds it.
+        """
+        arrays = {'order': self.order, 'times': self.times}
+        meta = {'n_rows': self.n_rows, 'dims': {}}
+        for col, (cats_lower, codes, postings, bounds) in self._dims.items():
+            arrays[f'{col}.codes'] = codes
+            arrays[f'{col}.postings'] = postings
+            meta['dims'][col] = {'categories': cats_lower.tolist(), 'bounds': bounds.tolist()}
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: dict) -> 'DatasetIndex':
+        """Index from arrays() output, using the arrays as they are (no copy)."""
+        index = cls.__new__(cls)
+        index.n_rows = meta['n_rows']
+        index.order = arrays['order']
+        index.times = arrays['times']
+        index._dims = {}
+        for col, dim in meta['dims'].items():
+            index._dims[col] = (pd.Index(dim['categories'], dtype=object), arrays[f'{col}.codes'], arrays[f'{col}.postings'],
+                                np.asarray(dim['bounds'], dtype=np.intp))
+        return index
+
+    def _time_bounds(self, start, end):
+        lo = 0 if start is None else int(np.searchsorted(self.times, np.datetime64(pd.to_datetime(start)), 'left'))
+        hi = self.n_rows if end is None else int(np.searchsorted(self.times, np.datetime64(pd.to_datetime(end)), 'right'))
+        return lo, max(lo, hi)
+
+    def query(self, keywords=None, platforms=None, content_types=None, regions=None, start=None, end=None) -> np.ndarray:
+        """
+        Row positions (for df.iloc/df.take) matching all filters, in datetime order.
+        Value filters are case-insensitive, like DataProcessor.filter_multi.
+        """
+        lo, hi = self._time_bounds(start or None, end or None)
+        selected = []
+        for col, values in (('keyword', keywords), ('platform', platforms), ('content_type', content_types), ('region', regions)):
+            if not values:
+                continue
+            if col not in self._dims:
+                raise KeyError(f"{col} is not indexed")
+            cats_lower, codes, postings, bounds = self._dims[col]
+            wanted = np.flatnonzero(cats_lower.isin({str(v).lower() for v in values}))
+            # per wanted code: the part of its posting list that falls inside [lo, hi)
+            slices = []
+            for c in wanted:
+                plist = postings[bounds[c]:bounds[c + 1]]
+                slices.append(plist[np.searchsorted(plist, lo):np.searchsorted(plist, hi)])
+            selected.append((sum(len(s) for s in slices), col, wanted, slices))
+
+        if not selected:
+            return self.order[lo:hi]
+        selected.sort(key=lambda item: item[0])
+        _, _, _, slices = selected[0]
+        positions = np.sort(np.concatenate(slices)) if slices else np.empty(0, dtype=np.intp)
+        for _, col, wanted, _ in selected[1:]:
+            if positions.size == 0:
+                break
+            _, codes, _, bounds = self._dims[col]
+            # trailing False catches code -1 (missing values)
+            lut = np.zeros(len(bounds), dtype=bool)
+            lut[wanted] = True
+            positions = positions[lut[codes[positions]]]
+        return self.order[positions]
@@ -0,0 +1,141 @@
+# mediapulse/keyed.py
+"""
+Summary tables kept in the order of their dimension columns, so a small delta can be
+folded in with binary search instead of regrouping the whole table.
+
+The dimensions of a row are packed into one int64 key: category codes, day numbers
+and integer columns become mixed-radix digits, the first dimension most significant.
+Categories are kept sorted, so key order is the order of the dimension values, and a
+table sorted by key stays sorted when new categories or a wider range of days show
+up. merge_sorted() looks the delta's keys up with np.searchsorted, combines the
+metrics of the rows already present and inserts the others at their positions: a few
+vectorized passes over the table's columns (which are copied - tables are never
+modified in place) plus O(delta log n) lookups.
+"""
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# keys stay clear of the int64 sign bit
+_MAX_RADIX = 2 ** 62
+
+
+def _is_categorical(values: pd.Series) -> bool:
+    return isinstance(values.dtype, pd.CategoricalDtype)
+
+
+def align_categories(table: pd.DataFrame, delta: pd.DataFrame, cols: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Give delta's cols the categories of table's, extended (in sorted order) by values
+    table hasn't seen; table's codes are remapped only when that happens.
+    """
+    table_cols, delta_cols = {}, {}
+    for col in cols:
+        current = table[col]
+        categories = current.cat.categories
+        values = delta[col]
+        seen = values.cat.categories if _is_categorical(values) else pd.Index(values.dropna().unique())
+        new = seen.difference(categories)
+        if len(new):
+            union = categories.append(new).sort_values()
+            codes = current.cat.codes.to_numpy()
+            remapped = np.where(codes < 0, -1, union.get_indexer(categories)[codes])
+            table_cols[col] = pd.Categorical.from_codes(remapped, categories=union)
+            categories = union
+        delta_cols[col] = pd.Categorical(values, categories=categories)
+    if table_cols:
+        table = table.assign(**table_cols)
+    return table, delta.assign(**delta_cols)
+
+
+def _values(values: pd.Series) -> np.ndarray:
+    if _is_categorical(values):
+        # -1 (missing) sorts first
+        return values.cat.codes.to_numpy().astype(np.int64) + 1
+    if values.dtype.kind == 'M':
+        return values.to_numpy().astype('datetime64[D]').astype(np.int64)
+    return values.to_numpy().astype(np.int64)
+
+
+def pack_keys(frames: List[pd.DataFrame], dims: List[str]) -> Optional[List[np.ndarray]]:
+    """
+    One int64 key per row of each frame, comparable across the frames (categorical
+    dims must share their categories, see align_categories). None if the dimensions
+    need more than 62 bits.
+    """
+    keys = [np.zeros(len(f), dtype=np.int64) for f in frames]
+    total = 1
+    for col in dims:
+        values = [_values(f[col]) for f in frames]
+        if _is_categorical(frames[0][col]):
+            lo, radix = 0, len(frames[0][col].cat.categories) + 1
+        else:
+            present = [v for v in values if len(v)]
+            lo = min(int(v.min()) for v in present) if present else 0
+            radix = (max(int(v.max()) for v in present) - lo + 1) if present else 1
+        total *= radix
+        if total > _MAX_RADIX:
+            return None
+        for key, v in zip(keys, values):
+            key *= radix
+            key += v - lo
+    return keys
+
+
+def sort_keyed(table: pd.DataFrame, dims: List[str]) -> pd.DataFrame:
+    """table in key order (unchanged if the dims don't pack; merge_sorted then falls back)."""
+    packed = pack_keys([table], dims)
+    if packed is None or len(table) < 2 or (packed[0][1:] > packed[0][:-1]).all():
+        return table
+    return table.take(np.argsort(packed[0], kind='stable')).reset_index(drop=True)
+
+
+def merge_sorted(table: pd.DataFrame, delta: pd.DataFrame, dims: List[str],
+                 combine: Callable[[pd.DataFrame, pd.DataFrame], pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """
+    table (unique dims, in key order) with delta's rows folded in. A delta row whose
+    dims are already in table is combined with that row by combine(table_rows,
+    delta_rows), which returns their merged metric columns; the others are inserted in
+    key order. delta must not repeat a key. None if the dims don't pack into a key or
+    table isn't a keyed table - callers then regroup the concatenation instead.
+    """
+    if table.empty:
+        return sort_keyed(delta.reset_index(drop=True), dims)
+    table, delta = align_categories(table, delta, [c for c in dims if _is_categorical(table[c])])
+    packed = pack_keys([table, delta], dims)
+    if packed is None:
+        return None
+    keys, delta_keys = packed
+    if len(keys) > 1 and not (keys[1:] > keys[:-1]).all():
+        return None
+    order = np.argsort(delta_keys, kind='stable')
+    delta_keys = delta_keys[order]
+    delta = delta.take(order).reset_index(drop=True)
+    pos = np.searchsorted(keys, delta_keys)
+    found = pos < len(keys)
+    found[found] = keys[pos[found]] == delta_keys[found]
+
+    combined = combine(table.take(pos[found]).reset_index(drop=True), delta[found].reset_index(drop=True))
+    added, at = delta[~found], pos[~found]
+    columns = {}
+    for col in table.columns:
+        current, extra = table[col], added[col]
+        if _is_categorical(current):
+            codes = np.insert(current.cat.codes.to_numpy(), at, extra.cat.codes.to_numpy())
+            columns[col] = pd.Categorical.from_codes(codes, categories=current.cat.categories)
+            continue
+        values = current.to_numpy()
+        if col in combined.columns:
+            update = combined[col].to_numpy()
+            values = values.astype(np.result_type(values, update, extra.to_numpy()), copy=True)
+            values[pos[found]] = update
+        columns[col] = np.insert(values, at, extra.to_numpy().astype(values.dtype))
+    return pd.DataFrame(columns)
+
+
+def add_metrics(metrics: List[str]) -> Callable[[pd.DataFrame, pd.DataFrame], pd.DataFrame]:
+    """combine() for tables of sums."""
+    def combine(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+        return pd.DataFrame({m: old[m].to_numpy() + new[m].to_numpy() for m in metrics})
+    return combine
@@ -0,0 +1,259 @@
+# mediapulse/metrics.py
+"""
+Lightweight per-stage instrumentation for the API.
+
+    with metrics.stage('aggregate', rows_in=len(df)) as s:
+        agg = ...
+        s.rows_out = len(agg)
+
+records wall time, rows in/out and peak memory growth of the stage into histograms
+labelled by stage, endpoint and freq; render() exposes them in the Prometheus text
+format. Endpoint/freq come from the current request scope (see request_scope() and
+label()), which lives in a context variable - code running on an executor must be
+called through contextvars.copy_context().run to see it.
+
+Peak memory growth is the highest resident set size of the process while the stage
+runs, minus the one it started with. A daemon thread samples RSS every
+RSS_SAMPLE_SECONDS while any stage is open, so memory a stage allocates and frees
+again before it ends is counted as long as it lives through a sample. RSS belongs to
+the whole process: stages running at the same time on other threads (e.g. with
+MEDIAPULSE_COMPUTE_WORKERS > 1) are billed for each other's allocations.
+
+Set MEDIAPULSE_METRICS=0 to turn it off: stage() then returns a shared no-op object
+and nothing is recorded. MEDIAPULSE_SERVER_TIMING=1 additionally collects the stage
+timings of each request for a Server-Timing response header.
+"""
+import contextvars
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+enabled = os.environ.get('MEDIAPULSE_METRICS', '1') != '0'
+server_timing = enabled and os.environ.get('MEDIAPULSE_SERVER_TIMING', '0') == '1'
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROWS_BUCKETS = (0, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+BYTES_BUCKETS = (0, 2 ** 20, 8 * 2 ** 20, 32 * 2 ** 20, 128 * 2 ** 20, 512 * 2 ** 20, 2 ** 31)
+RSS_SAMPLE_SECONDS = 0.002
+
+if os.path.exists('/proc/self/statm'):
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+    def _current_rss() -> int:
+        # second field: resident pages
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+else:
+    try:
+        import psutil
+    except ImportError:  # no /proc and no psutil: memory growth is reported as 0
+        psutil = None
+
+    def _current_rss() -> int:
+        return psutil.Process().memory_info().rss if psutil is not None else 0
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Tuple[str, ...]):
+        i = next((i for i, b in enumerate(self.buckets) if value <= b), len(self.buckets))
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in sorted(self._series.items())]
+        for labels, counts, total, count in snapshot:
+            base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{base},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{base}}} {total!r}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+STAGE_LABELS = ('stage', 'endpoint', 'freq')
+stage_seconds = Histogram('mediapulse_stage_seconds', 'Wall time of a pipeline stage.', STAGE_LABELS, SECONDS_BUCKETS)
+stage_rows_in = Histogram('mediapulse_stage_rows_in', 'Rows going into a pipeline stage.', STAGE_LABELS, ROWS_BUCKETS)
+stage_rows_out = Histogram('mediapulse_stage_rows_out', 'Rows coming out of a pipeline stage.', STAGE_LABELS, ROWS_BUCKETS)
+stage_memory = Histogram('mediapulse_stage_memory_bytes', 'Peak growth of the process-wide RSS during a pipeline stage.',
+                         STAGE_LABELS, BYTES_BUCKETS)
+request_seconds = Histogram('mediapulse_request_seconds', 'Wall time of an API request.', ('endpoint', 'freq'), SECONDS_BUCKETS)
+HISTOGRAMS = [request_seconds, stage_seconds, stage_rows_in, stage_rows_out, stage_memory]
+
+
+class RequestScope:
+    """Labels and (optionally) stage timings of one request."""
+
+    def __init__(self, endpoint: str = '', freq: str = ''):
+        self.endpoint = endpoint
+        self.freq = freq
+        self.timings: List[Tuple[str, float]] = []
+
+
+_scope: contextvars.ContextVar = contextvars.ContextVar('mediapulse_metrics_scope', default=None)
+
+
+def request_scope() -> Optional[RequestScope]:
+    """Open a scope for the current request (None when metrics are off)."""
+    if not enabled:
+        return None
+    scope = RequestScope()
+    _scope.set(scope)
+    return scope
+
+
+def label(endpoint: str = None, freq: str = None):
+    """Set the endpoint/freq labels of the current request's stages."""
+    scope = _scope.get()
+    if scope is None:
+        return
+    if endpoint is not None:
+        scope.endpoint = endpoint
+    if freq is not None:
+        scope.freq = freq
+
+
+class _PeakSampler:
+    """Samples RSS in a daemon thread while any stage is open and raises each open stage's _peak."""
+
+    def __init__(self):
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            # the thread doesn't survive a fork, and the lock may have been held when it happened
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._wake = threading.Condition()
+        self._open = set()
+        self._thread = None
+
+    def open(self, stage: '_Stage'):
+        stage._rss = stage._peak = _current_rss()
+        if not stage._rss:
+            return  # nothing to sample
+        with self._wake:
+            self._open.add(stage)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='mediapulse-rss-sampler', daemon=True)
+                self._thread.start()
+            self._wake.notify()
+
+    def close(self, stage: '_Stage') -> int:
+        """Peak RSS growth of the stage since open()."""
+        rss = _current_rss()
+        with self._wake:
+            self._open.discard(stage)
+        return max(stage._peak, rss) - stage._rss
+
+    def _run(self):
+        wake = self._wake
+        while True:
+            with wake:
+                while not self._open:
+                    wake.wait()
+            rss = _current_rss()
+            with wake:
+                for stage in self._open:
+                    if rss > stage._peak:
+                        stage._peak = rss
+            time.sleep(RSS_SAMPLE_SECONDS)
+
+
+_sampler = _PeakSampler()
+
+
+class _Stage:
+    __slots__ = ('name', 'rows_in', 'rows_out', '_start', '_rss', '_peak')
+
+    def __init__(self, name: str, rows_in: Optional[int]):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+    def __enter__(self):
+        _sampler.open(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        scope = _scope.get()
+        labels = (self.name, scope.endpoint if scope else '', scope.freq if scope else '')
+        stage_seconds.observe(elapsed, labels)
+        stage_memory.observe(_sampler.close(self), labels)
+        if self.rows_in is not None:
+            stage_rows_in.observe(self.rows_in, labels)
+        if self.rows_out is not None:
+            stage_rows_out.observe(self.rows_out, labels)
+        if server_timing and scope is not None:
+            scope.timings.append((self.name, elapsed))
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+    rows_in = rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str, rows_in: int = None):
+    """Context manager timing one pipeline stage; a shared no-op when metrics are off."""
+    if not enabled:
+        return _NULL_STAGE
+    return _Stage(name, rows_in)
+
+
+def server_timing_header(scope: Optional[RequestScope]) -> Optional[str]:
+    """Server-Timing value for the scope's stages (durations in ms), or None."""
+    if not server_timing or scope is None or not scope.timings:
+        return None
+    return ', '.join(f'{name};dur={seconds * 1000:.2f}' for name, seconds in scope.timings)
+
+
+def render(extra: Sequence[str] = ()) -> str:
+    """All histograms (plus any extra pre-rendered lines) in Prometheus text format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    lines.extend(extra)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,140 @@
+# mediapulse/online.py
+import json
+import os
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+class OnlineSpikeDetector:
+    """
+    Incremental spike detector for per-period keyword counts.
+
+    Keeps O(1) state per keyword - number of periods seen, running mean and variance,
+    and the last period processed - so an alerting job can feed it only the periods
+    that arrived since its last run instead of re-scanning history. Each new count is
+    scored against the state *before* it is folded in:
+
+      - mode='welford': exact running mean/variance over all periods seen (ddof=0, like
+        AnalyticsSummary.spike_detection)
+      - mode='ewma': exponentially weighted mean/variance with smoothing factor alpha,
+        so old periods fade out
+
+    Periods at or before a keyword's last processed period were already scored and are
+    ignored; `skipped` counts them.
+    """
+
+    def __init__(self, z_thresh: float = 2.5, mode: str = 'welford', alpha: float = 0.3, min_periods: int = 2):
+        if mode not in ('welford', 'ewma'):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.z_thresh = z_thresh
+        self.mode = mode
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.skipped = 0
+        # keyword -> slot in the state arrays
+        self._slots: Dict[str, int] = {}
+        self._n = np.zeros(0)
+        self._mean = np.zeros(0)
+        self._var = np.zeros(0)
+        self._last = np.zeros(0, dtype='datetime64[ns]')
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _slots_for(self, keywords) -> np.ndarray:
+        slots = np.fromiter((self._slots.setdefault(k, len(self._slots)) for k in keywords), dtype=np.intp, count=len(keywords))
+        grow = len(self._slots) - len(self._n)
+        if grow > 0:
+            self._n = np.concatenate([self._n, np.zeros(grow)])
+            self._mean = np.concatenate([self._mean, np.zeros(grow)])
+            self._var = np.concatenate([self._var, np.zeros(grow)])
+            self._last = np.concatenate([self._last, np.full(grow, np.datetime64('NaT'), dtype='datetime64[ns]')])
+        return slots
+
+    def update(self, keywords, period, counts) -> np.ndarray:
+        """
+        Score one period's counts (one entry per distinct keyword) and fold them into the
+        state. Returns the z-scores; NaN while a keyword has fewer than min_periods, and
+        for periods that were already processed.
+        """
+        period = np.datetime64(pd.Timestamp(period), 'ns')
+        slots = self._slots_for(list(keywords))
+        x = np.asarray(counts, dtype=float)
+        z = np.full(len(slots), np.nan)
+        new = ~(self._last[slots] >= period)
+        self.skipped += int((~new).sum())
+        slots, x = slots[new], x[new]
+
+        n, mean, var = self._n[slots], self._mean[slots], self._var[slots]
+        std = np.sqrt(var)
+        std = np.where(std == 0, 1.0, std)
+        z[new] = np.where(n >= self.min_periods, (x - mean) / std, np.nan)
+
+        delta = x - mean
+        if self.mode == 'welford':
+            mean_new = mean + delta / (n + 1)
+            # var is the population variance, i.e. M2 / n
+            var_new = (var * n + delta * (x - mean_new)) / (n + 1)
+        else:
+            first = n == 0
+            mean_new = np.where(first, x, mean + self.alpha * delta)
+            var_new = np.where(first, 0.0, (1 - self.alpha) * (var + self.alpha * delta ** 2))
+        self._n[slots] = n + 1
+        self._mean[slots] = mean_new
+        self._var[slots] = var_new
+        self._last[slots] = period
+        return z
+
+    def process(self, agg: pd.DataFrame) -> pd.DataFrame:
+        """
+        Feed aggregated rows (keyword, datetime, count, optionally broken down by other
+        columns) and return the spikes among them: keyword, datetime, count, z_score.
+        Rows are summed per (keyword, datetime) and processed in period order.
+        """
+        totals = agg.groupby(['datetime', 'keyword'], observed=True)['count'].sum()
+        out = []
+        for period, counts in totals.groupby(level='datetime', sort=True):
+            keywords = counts.index.get_level_values('keyword').astype(str)
+            z = self.update(keywords, period, counts.to_numpy())
+            hit = np.abs(z) > self.z_thresh
+            if hit.any():
+                out.append(pd.DataFrame({'keyword': keywords[hit], 'datetime': period,
+                                         'count': counts.to_numpy()[hit], 'z_score': z[hit]}))
+        if out:
+            return pd.concat(out, ignore_index=True)
+        return pd.DataFrame(columns=['keyword', 'datetime', 'count', 'z_score'])
+
+    def state(self) -> pd.DataFrame:
+        """Current per-keyword state as a frame (for inspection)."""
+        return pd.DataFrame({'n': self._n, 'mean': self._mean, 'var': self._var, 'last_period': self._last},
+                            index=pd.Index(list(self._slots), name='keyword'))
+
+    def save(self, path: str):
+        """Checkpoint parameters and per-keyword state to a JSON file (written atomically)."""
+        path = Path(path)
+        payload = {
+            'z_thresh': self.z_thresh, 'mode': self.mode, 'alpha': self.alpha, 'min_periods': self.min_periods,
+            'skipped': self.skipped,
+            'keywords': list(self._slots),
+            'n': self._n.tolist(), 'mean': self._mean.tolist(), 'var': self._var.tolist(),
+            'last_period': self._last.astype('int64').tolist(),
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(payload), encoding='utf-8')
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'OnlineSpikeDetector':
+        payload = json.loads(Path(path).read_text(encoding='utf-8'))
+        det = cls(z_thresh=payload['z_thresh'], mode=payload['mode'], alpha=payload['alpha'], min_periods=payload['min_periods'])
+        det.skipped = payload['skipped']
+        det._slots = {k: i for i, k in enumerate(payload['keywords'])}
+        det._n = np.asarray(payload['n'], dtype=float)
+        det._mean = np.asarray(payload['mean'], dtype=float)
+        det._var = np.asarray(payload['var'], dtype=float)
+        det._last = np.asarray(payload['last_period'], dtype='int64').view('datetime64[ns]')
+        return det
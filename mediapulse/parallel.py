@@ -0,0 +1,87 @@
+# mediapulse/parallel.py
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from mediapulse.fetcher import DataFetcher
+from mediapulse.processor import CATEGORY_COLUMNS, DataProcessor
+from mediapulse.rollup import RollupCube
+
+
+def _clean_shard(args) -> Tuple[int, pd.DataFrame]:
+    fetcher, processor = args
+    raw = fetcher.fetch()
+    return len(raw), processor.clean(raw)
+
+
+def _rollup_shard(args) -> pd.DataFrame:
+    fetcher, processor, chunksize = args
+    return RollupCube.from_chunks(fetcher.fetch_chunks(chunksize), processor).daily
+
+
+def _shard_fetchers(fetcher: DataFetcher) -> List[DataFetcher]:
+    return [type(fetcher)(str(path)) for path in fetcher.sources()]
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # never fork: reloads run on the API's thread pool, and forking a multithreaded
+    # process can deadlock the child on a lock some other thread held
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+
+def _workers(max_workers: int, n_shards: int) -> int:
+    return max(1, min(max_workers or os.cpu_count() or 1, n_shards))
+
+
+def concat_cleaned(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate cleaned frames, merging their category dictionaries (sorted, like clean())."""
+    out = pd.concat(frames)
+    for col in CATEGORY_COLUMNS:
+        if col in out.columns and all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+            out[col] = pd.Categorical(union_categoricals([f[col] for f in frames], sort_categories=True), ordered=False)
+    return out
+
+
+def load_cleaned(fetcher: DataFetcher, processor: DataProcessor, max_workers: int = None) -> pd.DataFrame:
+    """
+    Fetch and clean every shard behind fetcher (see DataFetcher.sources) on a process
+    pool, one task per shard, and concatenate the results. The output - including the
+    index labels - is the same as processor.clean(fetcher.fetch()). A single shard, or
+    max_workers=1, runs in-process. Workers are started with forkserver (spawn where
+    that isn't available), so this is safe to call from a threaded server.
+    """
+    shards = _shard_fetchers(fetcher)
+    workers = _workers(max_workers, len(shards))
+    if workers == 1:
+        return processor.clean(fetcher.fetch())
+    with _pool(workers) as pool:
+        results = list(pool.map(_clean_shard, [(f, processor) for f in shards]))
+    # shard-local labels -> labels of the concatenated raw frame
+    frames, offset = [], 0
+    for n_raw, df in results:
+        frames.append(df.set_axis(df.index + offset))
+        offset += n_raw
+    return concat_cleaned(frames)
+
+
+def rollup_parallel(fetcher: DataFetcher, processor: DataProcessor, max_workers: int = None, chunksize: int = 100_000) -> RollupCube:
+    """
+    Build a RollupCube with one worker per shard: each streams its shard in chunks into a
+    partial daily rollup, and the partials are merged. Nothing but rollups crosses
+    process boundaries.
+    """
+    shards = _shard_fetchers(fetcher)
+    workers = _workers(max_workers, len(shards))
+    if workers == 1:
+        return RollupCube.from_chunks(fetcher.fetch_chunks(chunksize), processor)
+    cube = RollupCube()
+    with _pool(workers) as pool:
+        for daily in pool.map(_rollup_shard, [(f, processor, chunksize) for f in shards]):
+            if not daily.empty:
+                cube.merge(daily)
+    return cube
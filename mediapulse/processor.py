@@ -1,28 +1,197 @@
 # mediapulse/processor.py  (updated)
+import re
 import pandas as pd
 import numpy as np
-from dateutil import parser
-from typing import Tuple, List
+from typing import Dict, Tuple, List
+
+# Formats tried (in order) by the vectorized datetime parser. Year-first formats are
+# unambiguous; the month-first/day-first groups are ordered by the processor's
+# policy so that values like 05-03-2021 resolve the same way dateutil would.
+ISO_DATETIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d']
+MONTH_FIRST_FORMATS = ['%m/%d/%Y %H:%M', '%m/%d/%Y %H:%M:%S', '%m/%d/%Y',
+                       '%m-%d-%Y %H:%M', '%m-%d-%Y %H:%M:%S', '%m-%d-%Y']
+DAY_FIRST_FORMATS = ['%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y',
+                     '%d-%m-%Y %H:%M', '%d-%m-%Y %H:%M:%S', '%d-%m-%Y']
+
+# every digit maps to '0' when computing the shape of a datetime string
+_DIGITS = str.maketrans('0123456789', '0' * 10)
+_SHAPE_DIRECTIVES = {'%Y': 'Y', '%m': 'd', '%d': 'd', '%H': 'd', '%M': 'd', '%S': 'd'}
+
+# dimensions kept as pandas Categoricals in the cleaned frame
+CATEGORY_COLUMNS = ['keyword', 'platform', 'content_type', 'region']
+# filter_multi argument -> column it filters
+FILTER_COLUMNS = {'keywords': 'keyword', 'platforms': 'platform', 'content_types': 'content_type', 'regions': 'region'}
+
+
+def isin_ci(col: pd.Series, values) -> np.ndarray:
+    """
+    Case-insensitive membership mask for col. On categorical columns only the category
+    dictionary is lowercased and rows are matched by their integer codes, so the cost
+    doesn't depend on the number or length of the strings.
+    """
+    wanted = {str(v).lower() for v in values}
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        hit = col.cat.categories.astype(str).str.lower().isin(wanted)
+        # code -1 (missing) indexes the trailing False
+        return np.append(hit, False)[col.cat.codes.to_numpy()]
+    return col.str.lower().isin(wanted).to_numpy()
+
+
+def union_filters(specs: List[Dict], by_cols: List[str] = None) -> Tuple[Dict, List[str]]:
+    """
+    Filters selecting every row any of specs selects (a dimension none of them filters,
+    or one that some spec leaves open, stays open), plus the dimensions outside
+    ['keyword'] + by_cols that some spec filters on: a shared aggregation has to keep
+    those as group columns so each spec can be sliced out of it (see slice_union).
+    """
+    by_cols = by_cols or []
+    union, extra = {}, []
+    for arg, col in FILTER_COLUMNS.items():
+        lists = [spec.get(arg) for spec in specs]
+        union[arg] = None if not all(lists) else sorted({str(v) for values in lists for v in values})
+        if any(lists) and col != 'keyword' and col not in by_cols:
+            extra.append(col)
+    return union, extra
+
+
+def slice_union(shared: pd.DataFrame, spec: Dict, by_cols: List[str] = None, extra: List[str] = ()) -> pd.DataFrame:
+    """One spec's aggregate out of the shared aggregation over union_filters(); extra dimensions are summed away."""
+    mask = np.ones(len(shared), dtype=bool)
+    for arg, col in FILTER_COLUMNS.items():
+        if spec.get(arg):
+            mask &= isin_ci(shared[col], spec[arg])
+    part = shared[mask]
+    if extra:
+        group_cols = ['keyword', 'datetime'] + (by_cols or [])
+        part = part.groupby(group_cols, as_index=False, observed=True)['count'].sum().sort_values(group_cols)
+    return part.reset_index(drop=True)
+
+
+def _canonical_shape(digit_shape: str) -> str:
+    """'00-00-0000 0:00' -> 'd-d-Y d:d': 4-digit runs are years, other digit runs fields, whitespace one space."""
+    shape = re.sub(r'\s+', ' ', digit_shape)
+    shape = re.sub(r'(?<!0)0000(?!0)', 'Y', shape)
+    return re.sub(r'0+', 'd', shape)
+
+
+def format_shape(fmt: str):
+    """
+    Shape of the strings fmt can match (see _canonical_shape), or None if fmt uses other
+    directives or puts two fields next to each other: the digits of a packed '%d%m%Y'
+    string form one run, so its shape can't tell which format it has.
+    """
+    if re.search(r'%[YmdHMS]%[YmdHMS]', fmt):
+        return None
+    shape = re.sub(r'%[YmdHMS]', lambda m: _SHAPE_DIRECTIVES[m.group()], re.sub(r'\s+', ' ', fmt))
+    return None if '%' in shape or '0' in shape else shape
+
+
+def as_datetime(values: pd.Series) -> pd.Series:
+    """values as datetime64; a column that already is one is returned as is (pd.to_datetime would still scan it)."""
+    return values if values.dtype.kind == 'M' else pd.to_datetime(values)
+
+
+def period_start(dt: pd.Series, freq: str) -> pd.Series:
+    """Start of the period each timestamp falls in (D/W/M, or any pandas floor freq)."""
+    if freq == 'D':
+        return dt.dt.floor('D')
+    if freq in ('W', 'M'):
+        return dt.dt.to_period(freq).dt.start_time
+    return dt.dt.floor(freq)
+
 
 class DataProcessor:
     def __init__(self, datetime_formats=None):
+        """
+        datetime_formats controls how raw datetime strings are parsed:
+          - None / 'monthfirst': built-in formats, ambiguous dates read month-first (dateutil default)
+          - 'dayfirst': built-in formats, ambiguous dates read day-first
+          - a list of strptime formats: tried in the given order
+        Values matching none of the formats fall back to dateutil.
+        """
         self.datetime_formats = datetime_formats
+        self.dayfirst = datetime_formats == 'dayfirst'
+        # rows handled by each parsing path during the last clean()/parse_datetime_series() call
+        self.parse_stats = {'formats': {}, 'fallback': 0, 'failed': 0}
+
+    def _candidate_formats(self) -> List[str]:
+        if self.datetime_formats is None or self.datetime_formats == 'monthfirst':
+            return ISO_DATETIME_FORMATS + MONTH_FIRST_FORMATS + DAY_FIRST_FORMATS
+        if self.datetime_formats == 'dayfirst':
+            return ISO_DATETIME_FORMATS + DAY_FIRST_FORMATS + MONTH_FIRST_FORMATS
+        if isinstance(self.datetime_formats, str):
+            return [self.datetime_formats]
+        return list(self.datetime_formats)
 
     def parse_datetime(self, s):
+        # only the fallback path needs dateutil
+        from dateutil import parser
         try:
-            return parser.parse(s)
+            dt = parser.parse(s, dayfirst=self.dayfirst)
         except Exception:
             return pd.NaT
+        return dt.replace(tzinfo=None) if dt.tzinfo is not None else dt
+
+    def parse_datetime_series(self, values: pd.Series) -> pd.Series:
+        """
+        Parse a column of raw datetime strings. Each distinct string is parsed once.
+        The formats present are detected from the shape of the strings (digit runs,
+        separators, letters): each candidate format is applied, with a vectorized
+        pd.to_datetime(format=...), only to the unparsed values of its shape, in
+        candidate order. Only what no format matches goes through dateutil.
+        """
+        codes, uniques = pd.factorize(values)
+        remaining = pd.Series(uniques, dtype=object)
+        parsed = np.full(len(remaining) + 1, np.datetime64('NaT'), dtype='datetime64[ns]')
+        # which path parsed each distinct value: format index, len(formats) = dateutil, -1 = failed
+        formats = self._candidate_formats()
+        path = np.full(len(remaining), -1)
+
+        # few distinct digit shapes ('00-00-0000 00:00'), so canonicalize those rather than every value
+        shape_codes, digit_shapes = pd.factorize(remaining.astype(str).str.translate(_DIGITS))
+        shapes = np.array([_canonical_shape(shape) for shape in digit_shapes] + [''], dtype=object)[shape_codes]
+
+        for i, fmt in enumerate(formats):
+            if remaining.empty:
+                break
+            fshape = format_shape(fmt)
+            # formats with directives other than %Y%m%d%H%M%S are tried on everything still unparsed
+            candidates = remaining if fshape is None else remaining[shapes[remaining.index] == fshape]
+            if candidates.empty:
+                continue
+            res = pd.to_datetime(candidates, format=fmt, errors='coerce')
+            hit = res.notna().to_numpy()
+            if hit.any():
+                pos = candidates.index[hit]
+                parsed[pos] = res[hit].to_numpy()
+                path[pos] = i
+                remaining = remaining.drop(pos)
+        if not remaining.empty:
+            res = pd.to_datetime(remaining.map(self.parse_datetime), errors='coerce')
+            hit = res.notna().to_numpy()
+            pos = remaining.index[hit]
+            parsed[pos] = res[hit].to_numpy()
+            path[pos] = len(formats)
+
+        # rows per distinct value -> rows per path; code -1 (missing) picks the trailing NaT
+        rows = np.bincount(codes[codes >= 0], minlength=len(path))
+        per_path = np.bincount(path + 1, weights=rows, minlength=len(formats) + 2).astype(int)
+        self.parse_stats = {
+            'formats': {fmt: int(n) for fmt, n in zip(formats, per_path[1:-1]) if n},
+            'fallback': int(per_path[-1]),
+            'failed': int(per_path[0] + (codes < 0).sum()),
+        }
+        return pd.Series(parsed[codes], index=values.index, name=values.name)
 
     def clean(self, df: pd.DataFrame) -> pd.DataFrame:
         df = df.copy()
         # parse datetimes
         if 'datetime_raw' in df.columns:
-            df['datetime'] = df['datetime_raw'].apply(self.parse_datetime)
+            df['datetime'] = self.parse_datetime_series(df['datetime_raw'])
             df = df.drop(columns=['datetime_raw'])
         else:
             # if datetime already present
-            df['datetime'] = df['datetime'].apply(self.parse_datetime) if df['datetime'].dtype == object else pd.to_datetime(df['datetime'])
+            df['datetime'] = self.parse_datetime_series(df['datetime']) if df['datetime'].dtype == object else pd.to_datetime(df['datetime'])
         # normalize categorical columns
         for col in ['platform', 'content_type', 'region']:
             if col not in df.columns:
@@ -41,6 +210,9 @@ class DataProcessor:
         df['count'] = pd.to_numeric(df['count'], errors='coerce').fillna(0).astype(int)
         df = df.dropna(subset=['datetime', 'keyword'])
         df['keyword'] = df['keyword'].astype(str).str.strip()
+        # low-cardinality text dimensions: store once per distinct value, filter on codes
+        for col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype('category')
         return df
 
     def aggregate(self, df: pd.DataFrame, freq: str = 'D', by_cols: List[str] = None, engagement_weighted: bool = False) -> pd.DataFrame:
@@ -49,37 +221,57 @@ class DataProcessor:
         engagement_weighted: if True, use 'engagement' as the metric (sum) instead of 'count'
         """
         df = df.copy()
-        df['datetime'] = pd.to_datetime(df['datetime'])
-        if freq == 'D':
-            df['period'] = df['datetime'].dt.floor('D')
-        elif freq == 'W':
-            df['period'] = df['datetime'].dt.to_period('W').apply(lambda r: r.start_time)
-        elif freq == 'M':
-            df['period'] = df['datetime'].dt.to_period('M').apply(lambda r: r.start_time)
-        else:
-            df['period'] = df['datetime'].dt.floor(freq)
+        df['datetime'] = as_datetime(df['datetime'])
+        df['period'] = period_start(df['datetime'], freq)
 
         metric = 'engagement' if engagement_weighted else 'count'
         group_cols = ['keyword', 'period'] + (by_cols if by_cols else [])
         # aggregate by the temporary 'period' column
-        agg = df.groupby(group_cols, as_index=False)[metric].sum().rename(columns={metric: 'count', 'period': 'datetime'})
+        agg = df.groupby(group_cols, as_index=False, observed=True)[metric].sum().rename(columns={metric: 'count', 'period': 'datetime'})
         # after renaming 'period' -> 'datetime' update the sort columns accordingly
         sort_cols = ['datetime' if c == 'period' else c for c in group_cols]
         agg = agg.sort_values(sort_cols)
         return agg
 
-    def filter_multi(self, df: pd.DataFrame, keywords=None, platforms=None, content_types=None, regions=None, start=None, end=None):
-        d = df.copy()
-        if keywords:
-            d = d[d['keyword'].str.lower().isin([k.lower() for k in keywords])]
-        if platforms:
-            d = d[d['platform'].str.lower().isin([p.lower() for p in platforms])]
-        if content_types:
-            d = d[d['content_type'].str.lower().isin([c.lower() for c in content_types])]
-        if regions:
-            d = d[d['region'].str.lower().isin([r.lower() for r in regions])]
+    def aggregate_batch(self, df: pd.DataFrame, specs: List[Dict], freq: str = 'D', by_cols: List[str] = None,
+                        engagement_weighted: bool = False, index=None) -> List[pd.DataFrame]:
+        """
+        aggregate(filter_multi(df, **spec), freq, by_cols, engagement_weighted) for each spec
+        (a dict of filter_multi arguments), in one filter + aggregate pass per distinct
+        (start, end) range instead of one per spec: the rows matching any spec of a range
+        are aggregated once and each answer is sliced out of that table.
+        """
+        for spec in specs:
+            unknown = set(spec) - set(FILTER_COLUMNS) - {'start', 'end'}
+            if unknown:
+                raise ValueError(f"Unknown filter(s): {sorted(unknown)}")
+        by_cols = list(by_cols or [])
+        ranges: Dict[tuple, List[int]] = {}
+        for i, spec in enumerate(specs):
+            ranges.setdefault((spec.get('start') or None, spec.get('end') or None), []).append(i)
+        out = [None] * len(specs)
+        for (start, end), members in ranges.items():
+            union, extra = union_filters([specs[i] for i in members], by_cols)
+            filtered = self.filter_multi(df, start=start, end=end, index=index, **union)
+            shared = self.aggregate(filtered, freq=freq, by_cols=by_cols + extra, engagement_weighted=engagement_weighted)
+            for i in members:
+                out[i] = slice_union(shared, specs[i], by_cols, extra)
+        return out
+
+    def filter_multi(self, df: pd.DataFrame, keywords=None, platforms=None, content_types=None, regions=None, start=None, end=None, index=None):
+        """
+        Rows matching all filters, sorted by datetime. Pass the DatasetIndex built for df
+        to resolve the filters from posting lists instead of scanning every column.
+        """
+        if index is not None:
+            return df.take(index.query(keywords=keywords, platforms=platforms, content_types=content_types, regions=regions, start=start, end=end))
+        # build one mask across all dimensions and copy only the matching rows
+        mask = np.ones(len(df), dtype=bool)
+        for col, values in (('keyword', keywords), ('platform', platforms), ('content_type', content_types), ('region', regions)):
+            if values:
+                mask &= isin_ci(df[col], values)
         if start:
-            d = d[d['datetime'] >= pd.to_datetime(start)]
+            mask &= (df['datetime'] >= pd.to_datetime(start)).to_numpy()
         if end:
-            d = d[d['datetime'] <= pd.to_datetime(end)]
-        return d.sort_values('datetime')
+            mask &= (df['datetime'] <= pd.to_datetime(end)).to_numpy()
+        return df[mask].sort_values('datetime')
@@ -0,0 +1,85 @@
+# mediapulse/result_cache.py
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable
+
+_MISSING = object()
+
+
+class ResultCache:
+    """
+    LRU + TTL cache for computed API responses, with request coalescing.
+
+    Entries expire `ttl` seconds after they were stored and the least recently used
+    entry is evicted beyond `maxsize`. While a value is being computed, further
+    callers asking for the same key await that computation instead of starting their
+    own. Failures are handed to every waiter and are not cached.
+
+    Must be used from a single event loop (one per API worker process).
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Cached values of those keys that have one; each distinct key counts as a hit or a miss."""
+        found = {}
+        for key in dict.fromkeys(keys):
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+                found[key] = value
+        return found
+
+    def put(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            # shield: a waiter going away must not cancel the shared computation
+            return await asyncio.shield(task)
+        self.misses += 1
+        task = asyncio.ensure_future(compute())
+        self._inflight[key] = task
+        try:
+            value = await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._inflight.pop(key, None)
+            else:
+                # we were cancelled; drop the in-flight marker once the computation ends
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        self.put(key, value)
+        return value
@@ -0,0 +1,151 @@
+# mediapulse/rollup.py
+import threading
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from mediapulse.keyed import add_metrics, merge_sorted, sort_keyed
+from mediapulse.processor import CATEGORY_COLUMNS, DataProcessor, as_datetime, isin_ci, period_start, slice_union, union_filters
+
+ROLLUP_FREQS = ('D', 'W', 'M')
+DIMENSIONS = ['keyword', 'datetime', 'platform', 'content_type', 'region']
+METRICS = ['count', 'engagement']
+_ADD = add_metrics(METRICS)
+
+
+class RollupCube:
+    """
+    Materialized sums of count and engagement by (keyword, period, platform,
+    content_type, region).
+
+    The daily table is the base: it is built from cleaned rows and can be extended
+    chunk by chunk with update(). Weekly and monthly tables are derived from the daily
+    one on first use (never from raw rows). Tables are kept in dimension order (see
+    keyed.py), so update() folds a chunk into the daily table - and into the derived
+    tables already built - by looking its days up rather than regrouping everything.
+    aggregate() answers the same question as DataProcessor.aggregate over
+    DataProcessor.filter_multi, reading only the (much smaller) rollup.
+    """
+
+    def __init__(self, daily: pd.DataFrame = None):
+        self.daily = daily if daily is not None else pd.DataFrame(columns=DIMENSIONS + METRICS)
+        self._derived: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'RollupCube':
+        cube = cls()
+        cube.update(df)
+        return cube
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[pd.DataFrame], processor: DataProcessor) -> 'RollupCube':
+        """
+        Build the cube from raw chunks (e.g. DataFetcher.fetch_chunks()), cleaning each one
+        and folding it in as it arrives, so only one chunk of rows is held at a time.
+        """
+        cube = cls()
+        for chunk in chunks:
+            cleaned = processor.clean(chunk)
+            if not cleaned.empty:
+                cube.update(cleaned)
+        return cube
+
+    @staticmethod
+    def _rollup(rows: pd.DataFrame) -> pd.DataFrame:
+        table = rows.groupby(DIMENSIONS, as_index=False, observed=True, sort=False)[METRICS].sum()
+        # pieces from different chunks may carry different category sets; re-encode
+        for col in CATEGORY_COLUMNS:
+            if not isinstance(table[col].dtype, pd.CategoricalDtype):
+                table[col] = table[col].astype('category')
+        return table
+
+    def update(self, df: pd.DataFrame):
+        """Fold cleaned rows into the daily table (rows for already-seen days are added in)."""
+        rows = df[[c for c in DIMENSIONS + METRICS if c != 'datetime']].copy()
+        rows['datetime'] = period_start(as_datetime(df['datetime']), 'D')
+        self.merge(self._rollup(rows))
+
+    def merge(self, daily: pd.DataFrame):
+        """Add another daily table (e.g. a partial built from one chunk or shard)."""
+        with self._lock:
+            merged = merge_sorted(self.daily, daily, DIMENSIONS, _ADD)
+            if merged is None:
+                self.daily = sort_keyed(self._rollup(pd.concat([self.daily, daily], ignore_index=True)), DIMENSIONS)
+                self._derived = {}
+                return
+            self.daily = merged
+            derived = {}
+            for freq, table in self._derived.items():
+                coarser = daily.assign(datetime=period_start(daily['datetime'], freq))
+                merged = merge_sorted(table, self._rollup(coarser), DIMENSIONS, _ADD)
+                if merged is not None:
+                    derived[freq] = merged
+            self._derived = derived
+
+    def copy(self) -> 'RollupCube':
+        # merge() replaces tables instead of modifying them, so the copy can share them
+        cube = RollupCube(self.daily)
+        cube._derived = dict(self._derived)
+        return cube
+
+    def table(self, freq: str = 'D') -> pd.DataFrame:
+        if freq not in ROLLUP_FREQS:
+            raise ValueError(f"Rollups are kept for {ROLLUP_FREQS}, not {freq}")
+        if freq == 'D':
+            return self.daily
+        with self._lock:
+            if freq not in self._derived:
+                coarser = self.daily.copy()
+                coarser['datetime'] = period_start(coarser['datetime'], freq)
+                self._derived[freq] = sort_keyed(self._rollup(coarser), DIMENSIONS)
+            return self._derived[freq]
+
+    def can_answer(self, freq: str = 'D', start=None, end=None) -> bool:
+        """
+        Whether aggregate() can serve this query exactly. Daily buckets can't split a day,
+        so start has to fall on midnight and an end bound (inclusive, to the nanosecond)
+        isn't supported; callers fall back to the raw rows for those.
+        """
+        if freq not in ROLLUP_FREQS or end:
+            return False
+        return not start or pd.Timestamp(start) == pd.Timestamp(start).normalize()
+
+    def aggregate(self, freq: str = 'D', by_cols: List[str] = None, engagement_weighted: bool = False,
+                  keywords=None, platforms=None, content_types=None, regions=None, start=None, end=None) -> pd.DataFrame:
+        """Same result as DataProcessor.aggregate(DataProcessor.filter_multi(df, ...), ...)."""
+        if not self.can_answer(freq, start, end):
+            raise ValueError("Query can't be answered from daily rollups; aggregate the raw rows instead")
+        # a start bound cuts through weeks/months, so filter days first and roll up after
+        t = self.table('D' if start else freq)
+        mask = np.ones(len(t), dtype=bool)
+        for col, values in (('keyword', keywords), ('platform', platforms), ('content_type', content_types), ('region', regions)):
+            if values:
+                mask &= isin_ci(t[col], values)
+        if start:
+            mask &= (t['datetime'] >= pd.Timestamp(start)).to_numpy()
+        t = t[mask]
+        if start and freq != 'D':
+            t = t.assign(datetime=period_start(t['datetime'], freq))
+
+        metric = 'engagement' if engagement_weighted else 'count'
+        group_cols = ['keyword', 'datetime'] + (by_cols if by_cols else [])
+        agg = t.groupby(group_cols, as_index=False, observed=True)[metric].sum().rename(columns={metric: 'count'})
+        return agg.sort_values(group_cols).reset_index(drop=True)
+
+    def aggregate_batch(self, specs: List[Dict], freq: str = 'D', by_cols: List[str] = None,
+                        engagement_weighted: bool = False) -> List[pd.DataFrame]:
+        """Same results as DataProcessor.aggregate_batch, answered from the rollup (one aggregate() per time range)."""
+        by_cols = list(by_cols or [])
+        ranges: Dict[tuple, List[int]] = {}
+        for i, spec in enumerate(specs):
+            ranges.setdefault((spec.get('start') or None, spec.get('end') or None), []).append(i)
+        out = [None] * len(specs)
+        for (start, end), members in ranges.items():
+            union, extra = union_filters([specs[i] for i in members], by_cols)
+            shared = self.aggregate(freq=freq, by_cols=by_cols + extra, engagement_weighted=engagement_weighted,
+                                    start=start, end=end, **union)
+            for i in members:
+                out[i] = slice_union(shared, specs[i], by_cols, extra)
+        return out
@@ -0,0 +1,188 @@
+# mediapulse/serialization.py
+import itertools
+import json
+from typing import Dict, Iterable, Iterator, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+
+def frame_columns(df: pd.DataFrame) -> Dict[str, object]:
+    """
+    Column-oriented view of df: {column: values}. Numeric, boolean and datetime columns
+    stay NumPy arrays (encoded directly by dumps()); categoricals are expanded from their
+    dictionary so no per-row objects are created; anything else becomes a list.
+    """
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            cats = np.append(s.cat.categories.astype(str).to_numpy(dtype=object), None)
+            out[col] = cats[s.cat.codes.to_numpy()].tolist()
+        elif s.dtype.kind in 'iufbM':
+            out[col] = np.ascontiguousarray(s.to_numpy())
+        else:
+            out[col] = s.tolist()
+    return out
+
+
+def stats_frame(stats: Dict[str, Dict]) -> pd.DataFrame:
+    """Per-keyword stats dict (AnalyticsSummary.compute_all_batch) as a frame, one row per keyword."""
+    if not stats:
+        return pd.DataFrame(columns=['keyword', 'peak', 'avg', 'trend', 'percent_change', 'moving_average'])
+    return pd.DataFrame.from_dict(stats, orient='index').rename_axis('keyword').reset_index()
+
+
+def _json_default(obj):
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'M':
+            strings = np.datetime_as_string(obj.astype('datetime64[s]'), unit='s')
+            return [None if v == 'NaT' else v for v in strings.tolist()]
+        if obj.dtype.kind == 'f':
+            return [None if np.isnan(v) else v for v in obj.tolist()]
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    """Encode obj (which may hold NumPy arrays from frame_columns) as JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+
+def arrow_table(df: pd.DataFrame):
+    import pyarrow as pa
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def arrow_ipc_stream(table, metadata: Dict[str, str] = None) -> bytes:
+    """Serialize a pyarrow Table as an Arrow IPC stream, attaching metadata to its schema."""
+    import pyarrow as pa
+    if metadata:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+EXPORT_MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+# the export encoders take one DataFrame or an iterable of DataFrames with the same
+# columns, which is consumed lazily - frames can be produced while the body is sent
+Frames = Union[pd.DataFrame, Iterable[pd.DataFrame]]
+
+
+def _frames(data: Frames) -> Iterator[pd.DataFrame]:
+    return iter([data]) if isinstance(data, pd.DataFrame) else iter(data)
+
+
+def _row_chunks(frames: Iterable[pd.DataFrame], chunk_rows: int):
+    """Slices of chunk_rows rows across frames (the last may be shorter); small frames are combined."""
+    pending, n = [], 0
+    for df in frames:
+        start = 0
+        while start < len(df):
+            piece = df.iloc[start:start + chunk_rows - n]
+            pending.append(piece)
+            n += len(piece)
+            start += len(piece)
+            if n == chunk_rows:
+                yield pending[0] if len(pending) == 1 else pd.concat(pending)
+                pending, n = [], 0
+    if pending:
+        yield pending[0] if len(pending) == 1 else pd.concat(pending)
+
+
+def iter_csv(data: Frames, chunk_rows: int = 10_000):
+    """Yield data as CSV text, chunk_rows rows at a time (header in the first chunk only)."""
+    frames = _frames(data)
+    first = next(frames, None)
+    if first is None:
+        return
+    header = True
+    for chunk in _row_chunks(itertools.chain([first], frames), chunk_rows):
+        yield chunk.to_csv(index=False, header=header)
+        header = False
+    if header:
+        yield first.to_csv(index=False)
+
+
+def iter_ndjson(data: Frames, chunk_rows: int = 10_000):
+    """Yield data as newline-delimited JSON objects, chunk_rows rows at a time."""
+    for chunk in _row_chunks(_frames(data), chunk_rows):
+        yield chunk.to_json(orient='records', lines=True, date_format='iso', date_unit='s')
+
+
+class _ByteSink:
+    """Write-only file object that hands out what was written since the last drain()."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # the Parquet writer records absolute offsets, so position survives drain()
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_parquet(data: Frames, chunk_rows: int = 10_000, metadata: Dict[str, str] = None):
+    """
+    Yield data as one Parquet file, written one row group per chunk_rows rows; each
+    row group's bytes are yielded as soon as it is written, the footer last. The
+    schema is taken from the first frame.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    frames = _frames(data)
+    first = next(frames, None)
+    if first is None:
+        return
+    schema = pa.Schema.from_pandas(first, preserve_index=False)
+    if metadata:
+        schema = schema.with_metadata({**(schema.metadata or {}), **metadata})
+    sink = _ByteSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in _row_chunks(itertools.chain([first], frames), chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
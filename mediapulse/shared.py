@@ -0,0 +1,160 @@
+# mediapulse/shared.py
+"""
+Share one cleaned dataset between API worker processes.
+
+A single loader process (python -m mediapulse.shared) keeps the dataset fresh with a
+regular DatasetStore and publishes every new snapshot as uncompressed Arrow IPC files
+- the cleaned columns (categorical codes + dictionaries, numeric and datetime arrays),
+the filter index, the daily rollup and the engagement sketches - into a generation directory under a shared
+root (/dev/shm by default), then flips a small pointer file to it.
+
+Workers run DatasetStore(shared=SharedDataset(root)): get() stats the pointer file
+and, when the generation changed, memory-maps the new files. Columns are used straight
+from the mapping, so the pages are shared by every worker instead of each holding its
+own copy. Old generations are removed after a few publishes; workers still mapping
+them keep working on POSIX systems, since unlinked files stay mapped.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from mediapulse.index import DatasetIndex
+from mediapulse.rollup import RollupCube
+from mediapulse.sketch import EngagementSketches
+from mediapulse.store import DatasetSnapshot, DatasetStore
+
+POINTER = 'CURRENT'
+
+
+def default_root() -> Path:
+    base = Path('/dev/shm') if os.path.isdir('/dev/shm') else Path(tempfile.gettempdir())
+    return base / 'mediapulse'
+
+
+def _write_arrow(table, path: Path):
+    import pyarrow as pa
+    # one record batch per file, so every column maps back as a single contiguous array
+    table = table.combine_chunks()
+    with pa.OSFile(str(path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _column_array(column):
+    # zero-copy view of a single-chunk column
+    return column.chunk(0).to_numpy() if column.num_chunks == 1 else column.to_numpy()
+
+
+def _read_arrow(path: Path):
+    import pyarrow as pa
+    return pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+
+
+class SharedDataset:
+    """Publisher/attacher for dataset generations under `root` (see the module docstring)."""
+
+    def __init__(self, root: str = None, keep: int = 3):
+        self.root = Path(root) if root else default_root()
+        # generations kept on disk; older ones are pruned on publish
+        self.keep = keep
+
+    def pointer_key(self) -> Optional[tuple]:
+        """Cheap change check: identity of the pointer file (it is replaced on every publish)."""
+        try:
+            st = os.stat(self.root / POINTER)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def pointer(self) -> Optional[dict]:
+        try:
+            return json.loads((self.root / POINTER).read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+
+    def publish(self, snap: DatasetSnapshot) -> int:
+        """Write snap as the next generation and point readers at it. Returns the generation."""
+        import pyarrow as pa
+        current = self.pointer()
+        generation = max([current['generation'] if current else 0] + self._generations()) + 1
+        gen_dir = self.root / f"gen-{generation}"
+        tmp_dir = self.root / f".gen-{generation}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        _write_arrow(pa.Table.from_pandas(snap.df, preserve_index=True), tmp_dir / 'frame.arrow')
+        arrays, index_meta = snap.index.arrays()
+        _write_arrow(pa.table({name: pa.array(values) for name, values in arrays.items()}), tmp_dir / 'index.arrow')
+        _write_arrow(pa.Table.from_pandas(snap.rollup.daily, preserve_index=False), tmp_dir / 'rollup.arrow')
+        _write_arrow(pa.Table.from_pandas(snap.sketches.moments, preserve_index=False), tmp_dir / 'sketch_moments.arrow')
+        _write_arrow(pa.Table.from_pandas(snap.sketches.buckets, preserve_index=False), tmp_dir / 'sketch_buckets.arrow')
+        (tmp_dir / 'index.json').write_text(json.dumps(index_meta), encoding='utf-8')
+        os.replace(tmp_dir, gen_dir)
+
+        pointer = {'generation': generation, 'dir': gen_dir.name, 'version': snap.version, 'parent': snap.parent,
+                   'signature': list(snap.signature), 'published_at': time.time()}
+        tmp = self.root / f".{POINTER}.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps(pointer), encoding='utf-8')
+        os.replace(tmp, self.root / POINTER)
+        self._prune(generation)
+        return generation
+
+    def _generations(self):
+        return [int(p.name[4:]) for p in self.root.glob('gen-*') if p.name[4:].isdigit()]
+
+    def _prune(self, generation: int):
+        for n in self._generations():
+            if n <= generation - self.keep:
+                shutil.rmtree(self.root / f"gen-{n}", ignore_errors=True)
+
+    def attach(self, pointer: dict) -> DatasetSnapshot:
+        """Snapshot backed by the memory-mapped files of the generation in pointer."""
+        gen_dir = self.root / pointer['dir']
+        # split_blocks keeps each column on its own mapped buffer instead of consolidating into copies
+        df = _read_arrow(gen_dir / 'frame.arrow').to_pandas(split_blocks=True)
+        index_table = _read_arrow(gen_dir / 'index.arrow')
+        arrays = {name: _column_array(index_table.column(name)) for name in index_table.column_names}
+        index = DatasetIndex.from_arrays(arrays, json.loads((gen_dir / 'index.json').read_text(encoding='utf-8')))
+        rollup = RollupCube(_read_arrow(gen_dir / 'rollup.arrow').to_pandas(split_blocks=True))
+        sketches = EngagementSketches(_read_arrow(gen_dir / 'sketch_moments.arrow').to_pandas(split_blocks=True),
+                                      _read_arrow(gen_dir / 'sketch_buckets.arrow').to_pandas(split_blocks=True))
+        return DatasetSnapshot(df, pointer['version'], pointer['generation'], tuple(pointer['signature']),
+                               rollup=rollup, index=index, sketches=sketches, parent=pointer.get('parent'))
+
+
+def serve(store: DatasetStore, shared: SharedDataset, interval: float = 5.0, once: bool = False):
+    """Loader loop: publish the store's snapshot whenever it changes."""
+    published = None
+    while True:
+        snap = store.get()
+        if snap.generation != published:
+            generation = shared.publish(snap)
+            published = snap.generation
+            print(f"published generation {generation} ({len(snap)} rows, version {snap.version}) to {shared.root}", flush=True)
+        if once:
+            return
+        time.sleep(interval)
+
+
+def main():
+    from mediapulse.fetcher import DataFetcher
+    from mediapulse.frame_cache import FrameCache
+    from mediapulse.processor import DataProcessor
+
+    parser = argparse.ArgumentParser(description="Publish the cleaned MediaPulse dataset for API workers")
+    parser.add_argument('csv_path', help="CSV file, directory of shards or glob")
+    parser.add_argument('--root', default=os.environ.get('MEDIAPULSE_SHARED_DIR'), help="shared directory (default /dev/shm/mediapulse)")
+    parser.add_argument('--interval', type=float, default=5.0, help="seconds between source checks")
+    parser.add_argument('--once', action='store_true', help="publish the current data and exit")
+    args = parser.parse_args()
+    store = DatasetStore(DataFetcher(args.csv_path), DataProcessor(), cache=FrameCache())
+    serve(store, SharedDataset(args.root), args.interval, args.once)
+
+
+if __name__ == '__main__':
+    main()
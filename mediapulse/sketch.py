@@ -0,0 +1,262 @@
+# mediapulse/sketch.py
+import threading
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from mediapulse.keyed import add_metrics, merge_sorted, sort_keyed
+from mediapulse.processor import isin_ci, period_start
+
+# quantiles are within 1% (relative) of the exact ones
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = np.log(_GAMMA)
+# bucket of zero (and, should any appear, negative) values: below the bucket of any
+# positive float64 (> -40000), yet close enough that bucket keys pack compactly
+ZERO_KEY = -2 ** 20
+
+SKETCH_DIMENSIONS = ['platform', 'content_type', 'region', 'datetime']
+BUCKET_DIMENSIONS = SKETCH_DIMENSIONS + ['key']
+CELL_DIMENSIONS = ['platform', 'content_type', 'region']
+
+
+def bucket_keys(values) -> np.ndarray:
+    """DDSketch bucket of each value: ceil(log_gamma(v)) for v > 0, ZERO_KEY otherwise."""
+    v = np.asarray(values, dtype=float)
+    keys = np.full(len(v), ZERO_KEY, dtype=np.int32)
+    positive = v > 0
+    keys[positive] = np.ceil(np.log(v[positive]) / _LOG_GAMMA)
+    return keys
+
+
+def bucket_values(keys) -> np.ndarray:
+    """Representative value of each bucket, within RELATIVE_ACCURACY of anything the bucket holds."""
+    keys = np.asarray(keys)
+    out = 2 * np.power(_GAMMA, keys.astype(float)) / (_GAMMA + 1)
+    out[keys == ZERO_KEY] = 0.0
+    return out
+
+
+class EngagementSketches:
+    """
+    Mergeable engagement summaries per (platform, content_type, region, day).
+
+    Each cell keeps a DDSketch (counts per logarithmic bucket, relative accuracy
+    RELATIVE_ACCURACY) for quantiles, plus count/mean/M2/min/max for the moments. Any
+    combination of cells merges exactly: bucket counts add up, moments combine with
+    Chan's parallel formula. So a distribution over any filter combination is computed
+    from the (small) cell tables instead of the raw rows:
+
+      - count, mean, std, min and max are exact (up to float rounding);
+      - quantiles are linearly interpolated between ranks like pandas/NumPy's
+        default, from bucket values within RELATIVE_ACCURACY of the values at those
+        ranks, so each is within RELATIVE_ACCURACY (1%) of the exact quantile.
+
+    Like RollupCube, cells are daily: filters on keyword, a start bound off midnight
+    or an end bound can't be served (can_answer) and need the raw rows instead.
+    """
+
+    def __init__(self, moments: pd.DataFrame = None, buckets: pd.DataFrame = None):
+        self.moments = moments if moments is not None else pd.DataFrame(columns=SKETCH_DIMENSIONS + ['n', 'mean', 'm2', 'min', 'max'])
+        self.buckets = buckets if buckets is not None else pd.DataFrame(columns=SKETCH_DIMENSIONS + ['key', 'n'])
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, value_col: str = 'engagement') -> 'EngagementSketches':
+        sketches = cls()
+        sketches.update(df, value_col)
+        return sketches
+
+    def copy(self) -> 'EngagementSketches':
+        # merge() replaces the tables instead of modifying them, so the copy can share them
+        return EngagementSketches(self.moments, self.buckets)
+
+    def update(self, df: pd.DataFrame, value_col: str = 'engagement'):
+        """Fold cleaned rows into the cells (rows for cells already present are added in)."""
+        rows = df[CELL_DIMENSIONS].copy()
+        rows['datetime'] = period_start(pd.to_datetime(df['datetime']), 'D')
+        rows['value'] = df[value_col]
+        rows = rows[rows['value'].notna()]
+        rows['key'] = bucket_keys(rows['value'].to_numpy())
+        buckets = rows.groupby(BUCKET_DIMENSIONS, as_index=False, observed=True, sort=False).size().rename(columns={'size': 'n'})
+        g = rows.groupby(SKETCH_DIMENSIONS, observed=True, sort=False)['value']
+        moments = g.agg(n='count', mean='mean', min='min', max='max').reset_index()
+        moments['mean'] = moments['mean'].astype(float)
+        moments['m2'] = g.var(ddof=0).fillna(0.0).to_numpy() * moments['n'].to_numpy()
+        self.merge(moments, buckets)
+
+    def merge(self, moments: pd.DataFrame, buckets: pd.DataFrame):
+        """
+        Add other cell tables (e.g. built from another chunk of rows). The tables are kept
+        in dimension order (see keyed.py), so only the delta's cells are looked up and
+        combined; the whole tables are regrouped only if their keys don't pack.
+        """
+        with self._lock:
+            merged_moments = merge_sorted(self.moments, moments, SKETCH_DIMENSIONS, _chan)
+            merged_buckets = merge_sorted(self.buckets, buckets, BUCKET_DIMENSIONS, _ADD_BUCKETS)
+            if merged_moments is None or merged_buckets is None:
+                if not self.moments.empty:
+                    moments = pd.concat([self.moments, moments], ignore_index=True)
+                    buckets = pd.concat([self.buckets, buckets], ignore_index=True)
+                merged_moments = sort_keyed(_merge_moments(moments, SKETCH_DIMENSIONS), SKETCH_DIMENSIONS)
+                merged_buckets = sort_keyed(buckets.groupby(BUCKET_DIMENSIONS, as_index=False, observed=True, sort=False)['n'].sum(),
+                                            BUCKET_DIMENSIONS)
+            self.moments, self.buckets = merged_moments, merged_buckets
+            for col in CELL_DIMENSIONS:
+                if not isinstance(self.moments[col].dtype, pd.CategoricalDtype):
+                    self.moments[col] = self.moments[col].astype('category')
+                # same codes in both tables, so buckets map onto the merged moments directly
+                categories = self.moments[col].cat.categories
+                if not (isinstance(self.buckets[col].dtype, pd.CategoricalDtype) and self.buckets[col].cat.categories.equals(categories)):
+                    self.buckets[col] = pd.Categorical(self.buckets[col], categories=categories)
+
+    @staticmethod
+    def can_answer(keywords=None, start=None, end=None) -> bool:
+        """Whether the cells can serve a query with these filters (see the class docstring)."""
+        if keywords or end:
+            return False
+        return not start or pd.Timestamp(start) == pd.Timestamp(start).normalize()
+
+    def _check(self, by: str, keywords, start, end):
+        if by not in CELL_DIMENSIONS:
+            raise ValueError(f"Sketches are kept by {CELL_DIMENSIONS}, not {by}")
+        if not self.can_answer(keywords, start, end):
+            raise ValueError("Query can't be answered from the sketches; use the raw rows instead")
+
+    def _select(self, table: pd.DataFrame, platforms=None, content_types=None, regions=None, start=None) -> pd.DataFrame:
+        if not (platforms or content_types or regions or start):
+            return table
+        mask = np.ones(len(table), dtype=bool)
+        for col, values in (('platform', platforms), ('content_type', content_types), ('region', regions)):
+            if values:
+                mask &= isin_ci(table[col], values)
+        if start:
+            mask &= (table['datetime'] >= pd.Timestamp(start)).to_numpy()
+        return table[mask]
+
+    def _merged(self, by: str, platforms=None, content_types=None, regions=None, start=None):
+        """
+        The cells matching the filters merged per `by` value (in category order): a frame
+        of by, n, mean, m2, min, max; the bucket values; and counts[group, bucket].
+        """
+        moments = self._select(self.moments, platforms, content_types, regions, start)
+        buckets = self._select(self.buckets, platforms, content_types, regions, start)
+        categories = self.moments[by].cat.categories
+        codes = moments[by].cat.codes.to_numpy()
+        present = np.flatnonzero(np.bincount(codes, minlength=len(categories)))
+        slot = np.full(len(categories), -1, dtype=np.intp)
+        slot[present] = np.arange(len(present))
+        g, n_groups = slot[codes], len(present)
+
+        # moments: Chan's combination, one bincount per sum
+        n = moments['n'].to_numpy(dtype=float)
+        mean = moments['mean'].to_numpy(dtype=float)
+        total = np.bincount(g, weights=n, minlength=n_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            group_mean = np.bincount(g, weights=n * mean, minlength=n_groups) / total
+        m2 = np.bincount(g, weights=moments['m2'].to_numpy(dtype=float) + n * (mean - group_mean[g]) ** 2, minlength=n_groups)
+        merged = pd.DataFrame({by: categories[present], 'n': total.astype(np.int64), 'mean': group_mean, 'm2': m2,
+                               'min': moments['min'].groupby(g).min().to_numpy(), 'max': moments['max'].groupby(g).max().to_numpy()})
+
+        # buckets: dense [group, key] counts; column 0 is the zero bucket
+        bg = slot[buckets[by].cat.codes.to_numpy()]
+        keys = buckets['key'].to_numpy().astype(np.int64)
+        zero = keys == ZERO_KEY
+        lo_key = int(keys[~zero].min()) if (~zero).any() else 0
+        width = int(keys[~zero].max()) - lo_key + 2 if (~zero).any() else 1
+        column = np.where(zero, 0, keys - lo_key + 1)
+        counts = np.bincount(bg * width + column, weights=buckets['n'].to_numpy(dtype=float),
+                             minlength=n_groups * width).reshape(n_groups, width)
+        values = np.concatenate([[0.0], bucket_values(np.arange(lo_key, lo_key + width - 1))])
+        return merged, values, counts
+
+    def quantiles(self, by: str, qs: Sequence[float], keywords=None, platforms=None, content_types=None, regions=None,
+                  start=None, end=None) -> pd.DataFrame:
+        """
+        Per-group merged moments (count, mean, std, min, max) and one column per quantile
+        in qs (named 'q0.25' etc.), for the rows matching the filters.
+        """
+        self._check(by, keywords, start, end)
+        return _quantile_frame(by, qs, *self._merged(by, platforms, content_types, regions, start))
+
+    def distribution(self, by: str = 'platform', **filters) -> pd.DataFrame:
+        """
+        AnalyticsSummary.engagement_distribution over the rows matching filters
+        (filter_multi arguments), from the sketches: count, mean, median, std, max.
+        """
+        out = self.quantiles(by, [0.5], **filters).rename(columns={'q0.5': 'median'})
+        return out[[by, 'count', 'mean', 'median', 'std', 'max']]
+
+    def box_stats(self, by: str = 'platform', max_outliers: int = 200, **filters) -> pd.DataFrame:
+        """
+        downsample.box_stats from the sketches. Whiskers end at the most extreme bucket
+        within 1.5 IQR of the box (the exact min/max when nothing lies outside), and the
+        outliers are bucket values - one point per bucket, most extreme first.
+        """
+        self._check(by, filters.get('keywords'), filters.get('start'), filters.get('end'))
+        merged, values, counts = self._merged(by, *(filters.get(k) for k in ('platforms', 'content_types', 'regions', 'start')))
+        stats = _quantile_frame(by, [0.25, 0.5, 0.75], merged, values, counts)
+        stats = stats.rename(columns={'q0.25': 'q1', 'q0.5': 'median', 'q0.75': 'q3'})
+        rows = []
+        for row, group_counts in zip(stats.itertuples(index=False), counts):
+            key, q1, median, q3 = getattr(row, by), row.q1, row.median, row.q3
+            lo, hi = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+            values_in_group = np.clip(values[group_counts > 0], row.min, row.max)
+            inside = values_in_group[(values_in_group >= lo) & (values_in_group <= hi)]
+            outliers = np.sort(values_in_group[(values_in_group < lo) | (values_in_group > hi)])
+            if len(outliers) > max_outliers:
+                outliers = outliers[np.argsort(-np.abs(outliers - median), kind='mergesort')[:max_outliers]]
+            rows.append({by: key, 'q1': q1, 'median': median, 'q3': q3,
+                         'lowerfence': row.min if row.min >= lo else inside.min(),
+                         'upperfence': row.max if row.max <= hi else inside.max(), 'n': row.count, 'outliers': outliers})
+        return pd.DataFrame(rows, columns=[by, 'q1', 'median', 'q3', 'lowerfence', 'upperfence', 'n', 'outliers'])
+
+
+_ADD_BUCKETS = add_metrics(['n'])
+
+
+def _chan(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Pairwise merge of two cells' count/mean/M2/min/max (Chan et al.)."""
+    n_a, n_b = old['n'].to_numpy(dtype=float), new['n'].to_numpy(dtype=float)
+    mean_a, mean_b = old['mean'].to_numpy(dtype=float), new['mean'].to_numpy(dtype=float)
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    return pd.DataFrame({'n': old['n'].to_numpy() + new['n'].to_numpy(), 'mean': mean_a + delta * n_b / n,
+                         'm2': old['m2'].to_numpy() + new['m2'].to_numpy() + delta ** 2 * n_a * n_b / n,
+                         'min': np.minimum(old['min'].to_numpy(), new['min'].to_numpy()),
+                         'max': np.maximum(old['max'].to_numpy(), new['max'].to_numpy())})
+
+
+def _merge_moments(cells: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+    """Combine count/mean/M2/min/max of cells into one row per `by` group (Chan et al.)."""
+    n = cells['n'].to_numpy(dtype=float)
+    mean = cells['mean'].to_numpy(dtype=float)
+    parts = cells[by].assign(n=cells['n'], w=n * mean, m2=cells['m2'], min=cells['min'], max=cells['max'])
+    keys = [parts[c] for c in by]
+    total_n = parts.groupby(keys, observed=True, sort=False)['n'].transform('sum').to_numpy(dtype=float)
+    group_mean = parts.groupby(keys, observed=True, sort=False)['w'].transform('sum').to_numpy() / total_n
+    parts['m2'] = parts['m2'] + n * (mean - group_mean) ** 2
+    out = parts.groupby(by, as_index=False, observed=True, sort=False).agg(n=('n', 'sum'), w=('w', 'sum'), m2=('m2', 'sum'),
+                                                                         min=('min', 'min'), max=('max', 'max'))
+    out['mean'] = out['w'] / out['n']
+    return out[by + ['n', 'mean', 'm2', 'min', 'max']]
+
+
+def _quantile_frame(by: str, qs: Sequence[float], merged: pd.DataFrame, values: np.ndarray, counts: np.ndarray) -> pd.DataFrame:
+    cumulative = np.cumsum(counts, axis=1)
+    out = merged[[by, 'n', 'mean', 'min', 'max']].rename(columns={'n': 'count'})
+    n = merged['n'].to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out['std'] = np.where(n > 1, np.sqrt(merged['m2'].to_numpy() / (n - 1)), np.nan)
+    lo, hi = out['min'].to_numpy(dtype=float), out['max'].to_numpy(dtype=float)
+
+    def at_rank(rank):
+        # first bucket whose cumulative count passes the (0-based) rank
+        pos = np.array([np.searchsorted(c, r, side='right') for c, r in zip(cumulative, rank)], dtype=np.intp)
+        return np.clip(values[np.minimum(pos, len(values) - 1)], lo, hi)
+    for q in qs:
+        rank = q * (n - 1)
+        below, above = at_rank(np.floor(rank)), at_rank(np.ceil(rank))
+        out[f'q{q}'] = below + (rank - np.floor(rank)) * (above - below)
+    return out
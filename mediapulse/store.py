@@ -0,0 +1,221 @@
+# mediapulse/store.py
+import hashlib
+import threading
+import time
+from typing import Optional, Tuple
+
+import pandas as pd
+
+from mediapulse.fetcher import DataFetcher, SourceRewritten
+from mediapulse.frame_cache import FrameCache
+from mediapulse.index import DatasetIndex
+from mediapulse import metrics
+from mediapulse.parallel import concat_cleaned, load_cleaned
+from mediapulse.rollup import RollupCube
+from mediapulse.sketch import EngagementSketches
+from mediapulse.processor import DataProcessor
+
+
+class DatasetSnapshot:
+    """
+    One cleaned load of the dataset. Treat it as read-only: a request should grab a
+    snapshot once and use it for its whole lifetime, so a concurrent reload can't
+    change the data halfway through.
+    """
+
+    def __init__(self, df: pd.DataFrame, version: str, generation: int, signature: Tuple[int, ...],
+                 rollup: RollupCube = None, watermark: Optional[dict] = None, index: DatasetIndex = None,
+                 sketches: EngagementSketches = None, parent: Optional[str] = None):
+        self.df = df
+        # filter index over df, built once per snapshot
+        self.index = index if index is not None else DatasetIndex(df)
+        # D/W/M sums by keyword x dimensions, answers most aggregate queries
+        self.rollup = rollup if rollup is not None else RollupCube.from_frame(df)
+        # engagement quantile sketches + moments by dimensions x day, for distributions and box plots
+        self.sketches = sketches if sketches is not None else EngagementSketches.from_frame(df)
+        self.version = version
+        self.generation = generation
+        self.signature = signature
+        # how far into the source files df goes (DataFetcher.watermark); None = unknown
+        self.watermark = watermark
+        # version of the snapshot this one extends by appending rows (df starts with all of
+        # its rows, in order); None after a full load
+        self.parent = parent
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.df)
+
+
+class DatasetStore:
+    """
+    Process-wide holder of the cleaned dataset.
+
+    The CSV is fetched and cleaned once; later calls to get() only stat the source
+    file(s) and reload when their mtime/size changed. A reload builds a complete new
+    snapshot before swapping the reference, so readers always see either the old
+    or the new version, never a mix. With a FrameCache the cleaned frame is read
+    from (or written to) the columnar cache instead of re-parsing the CSV.
+
+    With incremental=True (default) a source that only grew is not reloaded: the rows
+    appended past the snapshot's watermark are fetched and cleaned, and the new
+    snapshot gets the frame with those rows appended plus the index, rollup and
+    sketches with only the delta folded in (late rows for periods already present are
+    added into them). Parsing, cleaning, grouping and sorting follow the size of the
+    delta; what still grows with the dataset is copying the columns, so the previous
+    snapshot stays intact for its readers. Anything else (truncation, rewrite, a
+    removed shard) falls back to a full reload.
+
+    With shared=SharedDataset(...) the store runs as a worker: it never reads the CSV
+    itself but follows the generations a loader process publishes (see shared.py),
+    attaching to each one's memory-mapped columns instead of holding a private copy.
+    """
+
+    def __init__(self, fetcher: DataFetcher = None, processor: DataProcessor = None, cache: FrameCache = None,
+                 incremental: bool = True, shared=None):
+        self.fetcher = fetcher or DataFetcher()
+        self.processor = processor or DataProcessor()
+        self.cache = cache
+        self.incremental = incremental
+        self.shared = shared
+        # stat of the shared pointer file the current snapshot was checked against
+        self._shared_key = None
+        self._snapshot: Optional[DatasetSnapshot] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _signature(self) -> Tuple[int, ...]:
+        return self.fetcher.signature()
+
+    def _version(self, signature: Tuple[int, ...]) -> str:
+        key = '|'.join([str(self.fetcher.csv_path)] + [str(v) for v in signature])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+    def _load(self, signature: Tuple[int, ...]) -> DatasetSnapshot:
+        watermark = self.fetcher.watermark() if self.incremental else None
+        # fetch + clean (or a frame cache read)
+        with metrics.stage('load') as s:
+            if self.cache is not None:
+                df = self.cache.load(self.fetcher, self.processor)
+            else:
+                df = load_cleaned(self.fetcher, self.processor)
+            s.rows_out = len(df)
+        if watermark is not None and self._signature() != signature:
+            # appended to while loading: df may hold rows past the watermark, so the
+            # next change has to be a full reload rather than an append
+            watermark = None
+        self._generation += 1
+        return DatasetSnapshot(df, self._version(signature), self._generation, signature, watermark=watermark)
+
+    def _append(self, snap: DatasetSnapshot, signature: Tuple[int, ...]) -> DatasetSnapshot:
+        with metrics.stage('fetch') as s:
+            raw, watermark = self.fetcher.fetch_since(snap.watermark)
+            s.rows_out = len(raw)
+        with metrics.stage('clean', rows_in=len(raw)) as s:
+            new = self.processor.clean(raw)
+            s.rows_out = len(new)
+        df, index, rollup, sketches = snap.df, snap.index, snap.rollup, snap.sketches
+        if not new.empty:
+            # continue the row labels after the ones already in use
+            start = int(df.index.max()) + 1 if len(df) else 0
+            new = new.set_axis(new.index + start)
+            with metrics.stage('concat', rows_in=len(new)):
+                df = concat_cleaned([df, new]) if len(df) else new
+            with metrics.stage('index', rows_in=len(new)):
+                index = index.extend(df)
+            # the old snapshot's rollup and sketches stay untouched for readers still holding them
+            with metrics.stage('rollup_update', rows_in=len(new)):
+                rollup = rollup.copy()
+                rollup.update(new)
+            with metrics.stage('sketch_update', rows_in=len(new)):
+                sketches = sketches.copy()
+                sketches.update(new)
+        self._generation += 1
+        return DatasetSnapshot(df, self._version(signature), self._generation, signature, rollup=rollup, watermark=watermark,
+                               index=index, sketches=sketches, parent=snap.version)
+
+    def _refresh(self, snap: Optional[DatasetSnapshot], signature: Tuple[int, ...]) -> DatasetSnapshot:
+        if snap is not None and snap.watermark is not None and self.incremental:
+            try:
+                return self._append(snap, signature)
+            except SourceRewritten:
+                pass
+        return self._load(signature)
+
+    def get(self) -> DatasetSnapshot:
+        """
+        Return the current snapshot, refreshing first if the source file changed.
+        While another thread is reloading, callers keep getting the previous snapshot
+        instead of queueing behind the lock.
+        """
+        if self.shared is not None:
+            return self._get_shared()
+        snap = self._snapshot
+        try:
+            signature = self._signature()
+        except FileNotFoundError:
+            # source briefly missing (e.g. being replaced) - keep serving what we have
+            if snap is not None:
+                return snap
+            raise FileNotFoundError(f"CSV not found at {self.fetcher.csv_path}")
+        if snap is not None and snap.signature == signature:
+            return snap
+
+        if snap is not None:
+            if not self._lock.acquire(blocking=False):
+                return snap
+        else:
+            self._lock.acquire()
+        try:
+            current = self._snapshot
+            if current is not None and current.signature == signature:
+                return current
+            self._snapshot = self._refresh(current, signature)
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def _get_shared(self) -> DatasetSnapshot:
+        snap = self._snapshot
+        key = self.shared.pointer_key()
+        if key is None:
+            if snap is not None:
+                return snap
+            raise FileNotFoundError(f"No dataset published in {self.shared.root}")
+        if snap is not None and key == self._shared_key:
+            return snap
+
+        if snap is not None:
+            if not self._lock.acquire(blocking=False):
+                return snap
+        else:
+            self._lock.acquire()
+        try:
+            if self._snapshot is not None and key == self._shared_key:
+                return self._snapshot
+            pointer = self.shared.pointer()
+            if pointer is None:
+                if self._snapshot is None:
+                    raise FileNotFoundError(f"No dataset published in {self.shared.root}")
+                return self._snapshot
+            if self._snapshot is None or self._snapshot.generation != pointer['generation']:
+                try:
+                    self._snapshot = self.shared.attach(pointer)
+                except FileNotFoundError:
+                    # generation already pruned by a newer publish; pick that one up next time
+                    if self._snapshot is None:
+                        raise
+                    return self._snapshot
+            self._shared_key = key
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def reload(self) -> DatasetSnapshot:
+        """Force a reload regardless of the file signature."""
+        with self._lock:
+            if self.shared is not None:
+                self._snapshot = self.shared.attach(self.shared.pointer())
+            else:
+                self._snapshot = self._load(self._signature())
+            return self._snapshot
@@ -0,0 +1,123 @@
+# mediapulse/trending.py
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+class TrendingWindow:
+    """
+    Per-keyword sums over the last N periods, maintained as a sliding window.
+
+    Periods are pushed as they arrive: the new period's counts are added to the
+    running sums, and once more than N distinct periods are held the oldest one is
+    subtracted again. top() then picks the K largest sums with a partial selection
+    (np.partition), so neither pushing a period nor asking for the top K sorts the
+    whole vocabulary. The sums match AnalyticsSummary.top_trending_keywords over the
+    same rows; keywords tied at the cutoff are picked by name here, where
+    top_trending_keywords keeps whichever its (unstable) sort puts first.
+
+    A late period that is still inside the window is merged into it; anything older
+    than the window is ignored and counted in `skipped`.
+    """
+
+    def __init__(self, last_n_periods: int = 7):
+        if last_n_periods < 1:
+            raise ValueError("last_n_periods must be at least 1")
+        self.last_n_periods = last_n_periods
+        self.skipped = 0
+        # keyword -> slot in the sum arrays
+        self._slots: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._sums = np.zeros(0, dtype=np.int64)
+        # number of (period, keyword) entries in the window per slot; 0 = not trending at all
+        self._entries = np.zeros(0, dtype=np.int64)
+        # period -> (slots, counts), oldest first
+        self._periods: Dict[pd.Timestamp, tuple] = {}
+
+    def __len__(self):
+        return int((self._entries > 0).sum())
+
+    @property
+    def periods(self) -> List[pd.Timestamp]:
+        return list(self._periods)
+
+    @classmethod
+    def from_frame(cls, agg: pd.DataFrame, last_n_periods: int = 7) -> 'TrendingWindow':
+        """Window over the last N periods of aggregated rows (keyword, datetime, count)."""
+        window = cls(last_n_periods)
+        times = agg['datetime'].to_numpy()
+        periods = np.unique(times)
+        if len(periods):
+            # only the rows that can end up in the window are pushed
+            window.add(agg[times >= periods[-last_n_periods:][0]])
+        return window
+
+    def copy(self) -> 'TrendingWindow':
+        """Independent copy: pushing to it leaves this window as it is."""
+        window = TrendingWindow(self.last_n_periods)
+        window.skipped = self.skipped
+        window._slots = dict(self._slots)
+        window._names = list(self._names)
+        window._sums = self._sums.copy()
+        window._entries = self._entries.copy()
+        # push() replaces a period's arrays instead of modifying them, so they can be shared
+        window._periods = dict(self._periods)
+        return window
+
+    def _slots_for(self, keywords) -> np.ndarray:
+        for k in keywords:
+            if k not in self._slots:
+                self._slots[k] = len(self._names)
+                self._names.append(k)
+        grow = len(self._names) - len(self._sums)
+        if grow > 0:
+            self._sums = np.concatenate([self._sums, np.zeros(grow, dtype=self._sums.dtype)])
+            self._entries = np.concatenate([self._entries, np.zeros(grow, dtype=np.int64)])
+        return np.fromiter((self._slots[k] for k in keywords), dtype=np.intp, count=len(keywords))
+
+    def push(self, period, keywords, counts):
+        """Add one period's counts (keywords may repeat; their counts are summed)."""
+        period = pd.Timestamp(period)
+        if len(self._periods) >= self.last_n_periods and period < next(iter(self._periods)):
+            self.skipped += 1
+            return
+        keywords = [str(k) for k in keywords]
+        slots = self._slots_for(keywords)
+        counts = np.asarray(counts)
+        if counts.dtype.kind == 'f' and self._sums.dtype.kind != 'f':
+            self._sums = self._sums.astype(float)
+        np.add.at(self._sums, slots, counts)
+        np.add.at(self._entries, slots, 1)
+
+        if period in self._periods:
+            old_slots, old_counts = self._periods[period]
+            self._periods[period] = (np.concatenate([old_slots, slots]), np.concatenate([old_counts, counts]))
+        else:
+            late = bool(self._periods) and period < next(reversed(self._periods))
+            self._periods[period] = (slots, counts)
+            if late:
+                self._periods = dict(sorted(self._periods.items()))
+        while len(self._periods) > self.last_n_periods:
+            expired = next(iter(self._periods))
+            old_slots, old_counts = self._periods.pop(expired)
+            np.subtract.at(self._sums, old_slots, old_counts)
+            np.subtract.at(self._entries, old_slots, 1)
+
+    def add(self, agg: pd.DataFrame):
+        """Push aggregated rows (keyword, datetime, count, possibly broken down further), period by period."""
+        totals = agg.groupby(['datetime', 'keyword'], observed=True)['count'].sum()
+        for period, counts in totals.groupby(level='datetime', sort=True):
+            self.push(period, counts.index.get_level_values('keyword'), counts.to_numpy())
+
+    def top(self, top_k: int = 5) -> pd.DataFrame:
+        """The top_k keywords by windowed sum: keyword, count (largest first, ties by keyword)."""
+        if top_k <= 0:
+            return pd.DataFrame(columns=['keyword', 'count'])
+        live = np.flatnonzero(self._entries > 0)
+        if top_k < len(live):
+            # K-th largest sum by partial selection; keep everything tied with it
+            kth = np.partition(self._sums[live], len(live) - top_k)[len(live) - top_k]
+            live = live[self._sums[live] >= kth]
+        top = pd.DataFrame({'keyword': [self._names[s] for s in live], 'count': self._sums[live]})
+        return top.sort_values(['count', 'keyword'], ascending=[False, True], kind='mergesort').head(top_k).reset_index(drop=True)
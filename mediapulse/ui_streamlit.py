@@ -4,66 +4,136 @@ from mediapulse.fetcher import DataFetcher
 from mediapulse.processor import DataProcessor
 from mediapulse.analytics import AnalyticsSummary
 from mediapulse.charts import ChartRenderer
+from mediapulse.downsample import box_stats
+from mediapulse.frame_cache import FrameCache
+from mediapulse.store import DatasetStore
 import pandas as pd
 
-st.set_page_config(page_title="MediaPulse", page_icon="🚀", layout="wide")
-st.title("MediaPulse — Trending Content Analyzer (Enhanced)")
+# Streamlit re-runs this script on every widget interaction. Everything expensive is
+# cached across reruns and sessions: the dataset (one DatasetStore per server process,
+# reloaded only when the CSV changes) and the filter/aggregation results, keyed by
+# dataset version + filter state. Arguments starting with '_' are not hashed by
+# st.cache_data; the version stands in for them.
 
-fetcher = DataFetcher()
 processor = DataProcessor()
 analytics = AnalyticsSummary()
 charts = ChartRenderer()
 
-raw = fetcher.fetch()
-cleaned = processor.clean(raw)
-
-# Sidebar selectors
-st.sidebar.header("Filters")
-keywords = sorted(cleaned['keyword'].str.lower().unique().tolist())
-selected_keywords = st.sidebar.multiselect("Keywords (empty = all)", options=keywords, default=keywords[:3])
-platforms = sorted(cleaned['platform'].str.lower().unique().tolist())
-selected_platforms = st.sidebar.multiselect("Platforms", options=platforms, default=platforms)
-content_types = sorted(cleaned['content_type'].str.lower().unique().tolist())
-selected_content_types = st.sidebar.multiselect("Content types", options=content_types, default=content_types)
-regions = sorted(cleaned['region'].str.lower().unique().tolist())
-selected_regions = st.sidebar.multiselect("Regions", options=regions, default=regions[:5])
-
-freq = st.sidebar.selectbox("Aggregation", options=['D','W','M'], index=0, format_func=lambda x: {'D':'Daily','W':'Weekly','M':'Monthly'}[x])
-engagement_weighted = st.sidebar.checkbox("Use engagement-weighted metric", value=False)
-ma_window = st.sidebar.slider("Moving average window", 1, 14, 3)
-
-if st.sidebar.button("Analyze"):
-    # apply filters
-    kws = selected_keywords if selected_keywords else None
-    plats = selected_platforms if selected_platforms else None
-    cts = selected_content_types if selected_content_types else None
-    regs = selected_regions if selected_regions else None
-
-    filtered = processor.filter_multi(cleaned, keywords=kws, platforms=plats, content_types=cts, regions=regs)
-    if filtered.empty:
+BY_COLS = ['platform', 'content_type', 'region']
+
+
+@st.cache_resource
+def get_store() -> DatasetStore:
+    # cleaned frame comes from the columnar cache when the CSV hasn't changed
+    return DatasetStore(DataFetcher(), processor, cache=FrameCache())
+
+
+@st.cache_data(max_entries=4)
+def filter_options(_snap, version: str) -> dict:
+    """Lowercased, de-duplicated values per filter dimension (read from the category dictionaries)."""
+    return {col: sorted(_snap.df[col].cat.categories.str.lower().unique().tolist())
+            for col in ['keyword', 'platform', 'content_type', 'region']}
+
+
+@st.cache_data(max_entries=32)
+def filtered_rows(_snap, version: str, filters: tuple) -> pd.DataFrame:
+    return processor.filter_multi(_snap.df, index=_snap.index, **dict(filters))
+
+
+@st.cache_data(max_entries=32)
+def aggregated(_snap, version: str, filters: tuple, freq: str, engagement_weighted: bool) -> pd.DataFrame:
+    return _snap.rollup.aggregate(freq=freq, by_cols=BY_COLS, engagement_weighted=engagement_weighted, **dict(filters))
+
+
+@st.cache_data(max_entries=32)
+def engagement_summary(_snap, version: str, filters: tuple):
+    """Box stats + distribution by platform: merged from the sketches unless keywords are filtered."""
+    f = dict(filters)
+    if _snap.sketches.can_answer(f.get('keywords')):
+        return _snap.sketches.box_stats(by='platform', **f), _snap.sketches.distribution(by='platform', **f)
+    rows = filtered_rows(_snap, version, filters)
+    return box_stats(rows, 'platform', 'engagement'), analytics.engagement_distribution(rows, by='platform')
+
+
+@st.cache_data(max_entries=32)
+def spikes_for(_agg, version: str, filters: tuple, freq: str, engagement_weighted: bool) -> pd.DataFrame:
+    return analytics.spike_detection(_agg)
+
+
+def main():
+    st.set_page_config(page_title="MediaPulse", page_icon="🚀", layout="wide")
+    st.title("MediaPulse — Trending Content Analyzer (Enhanced)")
+
+    snap = get_store().get()
+    options = filter_options(snap, snap.version)
+
+    # Sidebar selectors
+    st.sidebar.header("Filters")
+    keywords = options['keyword']
+    selected_keywords = st.sidebar.multiselect("Keywords (empty = all)", options=keywords, default=keywords[:3])
+    platforms = options['platform']
+    selected_platforms = st.sidebar.multiselect("Platforms", options=platforms, default=platforms)
+    content_types = options['content_type']
+    selected_content_types = st.sidebar.multiselect("Content types", options=content_types, default=content_types)
+    regions = options['region']
+    selected_regions = st.sidebar.multiselect("Regions", options=regions, default=regions[:5])
+
+    freq = st.sidebar.selectbox("Aggregation", options=['D','W','M'], index=0, format_func=lambda x: {'D':'Daily','W':'Weekly','M':'Monthly'}[x])
+    engagement_weighted = st.sidebar.checkbox("Use engagement-weighted metric", value=False)
+    ma_window = st.sidebar.slider("Moving average window", 1, 14, 3)
+
+    # the analyzed filter state survives reruns, so opening a section below doesn't
+    # require pressing Analyze again
+    if st.sidebar.button("Analyze"):
+        st.session_state['analysis'] = dict(
+            filters=(('keywords', tuple(selected_keywords) or None), ('platforms', tuple(selected_platforms) or None),
+                     ('content_types', tuple(selected_content_types) or None), ('regions', tuple(selected_regions) or None)),
+            freq=freq, engagement_weighted=engagement_weighted)
+    analysis = st.session_state.get('analysis')
+    if analysis is None:
+        return
+
+    filters, freq, engagement_weighted = analysis['filters'], analysis['freq'], analysis['engagement_weighted']
+    kws, regs = dict(filters)['keywords'], dict(filters)['regions']
+    agg = aggregated(snap, snap.version, filters, freq, engagement_weighted)
+    if agg.empty:
         st.warning("No data for selected filters.")
+        return
+
+    st.subheader("Aggregate sample")
+    st.dataframe(agg.head(50))
+
+    # show stacked area across platforms (for overall)
+    st.subheader("Volume by Platform (stacked)")
+    try:
+        area_fig = charts.plotly_stacked_area(agg.groupby(['datetime','platform'], as_index=False, observed=True)['count'].sum())
+        st.plotly_chart(area_fig, use_container_width=True)
+    except Exception as e:
+        st.error(f"Area chart failed: {e}")
+
+    # spike detection & table
+    st.subheader("Detected spikes")
+    spikes = spikes_for(agg, snap.version, filters, freq, engagement_weighted)
+    if not spikes.empty:
+        st.dataframe(spikes)
     else:
-        agg = processor.aggregate(filtered, freq=freq, by_cols=['platform','content_type','region'], engagement_weighted=engagement_weighted)
-        st.subheader("Aggregate sample")
-        st.dataframe(agg.head(50))
+        st.write("No spikes detected with current parameters.")
 
-        # show stacked area across platforms (for overall)
-        st.subheader("Volume by Platform (stacked)")
-        try:
-            area_fig = charts.plotly_stacked_area(agg.groupby(['datetime','platform'], as_index=False)['count'].sum())
-            st.plotly_chart(area_fig, use_container_width=True)
-        except Exception as e:
-            st.error(f"Area chart failed: {e}")
+    # the remaining sections are only computed once the user opens them
 
-        # engagement distribution by platform
+    # engagement distribution by platform
+    if st.checkbox("Show engagement distribution"):
         st.subheader("Engagement distribution")
         try:
-            box_fig = charts.plotly_box_engagement(filtered, by='platform')
+            stats, distribution = engagement_summary(snap, snap.version, filters)
+            box_fig = charts.plotly_box_engagement(None, by='platform', stats=stats)
             st.plotly_chart(box_fig, use_container_width=True)
+            st.dataframe(distribution)
         except Exception as e:
             st.error(f"Box plot failed: {e}")
 
-        # top-by-region heatmap (bar fallback)
+    # top-by-region heatmap (bar fallback)
+    if st.checkbox("Show engagement by region"):
         st.subheader("Engagement by Region")
         try:
             region_fig = charts.plotly_region_heatmap(agg)
@@ -71,38 +141,34 @@ if st.sidebar.button("Analyze"):
         except Exception as e:
             st.error(f"Region chart failed: {e}")
 
-        # spike detection & table
-        st.subheader("Detected spikes")
-        spikes = analytics.spike_detection(agg)
-        if not spikes.empty:
-            st.dataframe(spikes)
+    # per-keyword time-series with platform breakdown (first chosen keyword)
+    if kws and st.checkbox("Show keyword time series"):
+        chosen = kws[0]
+        st.subheader(f"Time series for '{chosen}' (platform breakdown)")
+        kw_agg = agg[agg['keyword'].str.lower() == chosen.lower()]
+        if kw_agg.empty:
+            st.write("No data for this keyword after aggregation.")
         else:
-            st.write("No spikes detected with current parameters.")
-
-        # per-keyword time-series with platform breakdown (first chosen keyword)
-        if selected_keywords:
-            chosen = selected_keywords[0]
-            st.subheader(f"Time series for '{chosen}' (platform breakdown)")
-            kw_agg = agg[agg['keyword'].str.lower() == chosen.lower()]
-            if kw_agg.empty:
-                st.write("No data for this keyword after aggregation.")
-            else:
-                try:
-                    fig_ts = charts.plotly_time_series(kw_agg, chosen, moving_avg=analytics.moving_average(kw_agg, ma_window).tolist(), color_col='platform')
-                    st.plotly_chart(fig_ts, use_container_width=True)
-                except Exception as e:
-                    st.error(f"TS plot failed: {e}")
-
-        # top content types in selected regions (first region)
-        if selected_regions:
-            r = selected_regions[0]
-            st.subheader(f"Top content types in region: {r}")
-            top_ct = analytics.region_top_content(filtered, r)
-            if not top_ct.empty:
-                st.table(top_ct)
-            else:
-                st.write("No content-type data for this region.")
-
-        # export aggregated file
+            try:
+                fig_ts = charts.plotly_time_series(kw_agg, chosen, moving_avg=analytics.moving_average(kw_agg, ma_window).tolist(), color_col='platform')
+                st.plotly_chart(fig_ts, use_container_width=True)
+            except Exception as e:
+                st.error(f"TS plot failed: {e}")
+
+    # top content types in selected regions (first region)
+    if regs and st.checkbox("Show top content types by region"):
+        r = regs[0]
+        st.subheader(f"Top content types in region: {r}")
+        top_ct = analytics.region_top_content(filtered_rows(snap, snap.version, filters), r)
+        if not top_ct.empty:
+            st.table(top_ct)
+        else:
+            st.write("No content-type data for this region.")
+
+    # export aggregated file; the CSV text is only built when asked for
+    if st.checkbox("Prepare CSV download"):
         st.download_button("Download aggregated CSV", data=agg.to_csv(index=False), file_name="mediapulse_agg.csv")
 
+
+if __name__ == '__main__':
+    main()